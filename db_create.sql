@@ -15,6 +15,19 @@ CREATE TABLE stock_names (
   full_name VARCHAR(255)
 );
 
+CREATE TABLE candles (
+  id BIGINT AUTO_INCREMENT,
+  ticker_id INT NOT NULL,
+  ts DATETIME NOT NULL,
+  open DECIMAL(10, 2),
+  high DECIMAL(10, 2),
+  low DECIMAL(10, 2),
+  close DECIMAL(10, 2),
+  volume BIGINT,
+  PRIMARY KEY (ticker_id, ts),
+  UNIQUE KEY candles_id (id)
+);
+
 CREATE TABLE table_securities (
   id INT AUTO_INCREMENT PRIMARY KEY,
   user_id INT NOT NULL,
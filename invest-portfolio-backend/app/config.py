@@ -20,4 +20,46 @@ class Config:
 
     # Настройки загрузки данных
     DATA_UPLOAD_FOLDER = os.environ.get('DATA_UPLOAD_FOLDER', 'data/')
-    MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # 64MB max file upload
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # 64MB max file upload
+
+    # Настройки загрузки свечей с MOEX
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 4))
+    INGEST_RETRIES = int(os.environ.get('INGEST_RETRIES', 3))
+    INGEST_BACKOFF = float(os.environ.get('INGEST_BACKOFF', 2.0))  # секунды, удваивается с каждой попыткой
+    MOEX_MIN_INTERVAL = float(os.environ.get('MOEX_MIN_INTERVAL', 0.5))  # минимальный интервал между запросами к MOEX
+
+    # Сколько моделей (тренд и сток считаются отдельно) держать загруженными в памяти
+    MODEL_REGISTRY_SIZE = int(os.environ.get('MODEL_REGISTRY_SIZE', 6))
+
+    # Фоновое обучение моделей
+    TRAIN_WORKERS = int(os.environ.get('TRAIN_WORKERS', 1))
+    TRAIN_JOBS_HISTORY = int(os.environ.get('TRAIN_JOBS_HISTORY', 100))  # сколько завершенных задач помнить
+
+    # Пакетное переобучение всех тикеров (python -m app.utils.train_all)
+    TRAIN_PROCESSES = int(os.environ.get('TRAIN_PROCESSES', 0))  # 0 - по числу ядер, но не больше числа тикеров
+    TRAIN_THREADS_PER_PROCESS = int(os.environ.get('TRAIN_THREADS_PER_PROCESS', 0))  # 0 - ядра поровну между процессами
+    TRAIN_SUMMARY_PATH = os.environ.get('TRAIN_SUMMARY_PATH', 'app/ml_models/models/train_summary.json')
+
+    # Кэш готовых прогнозов
+    PREDICT_CACHE_SIZE = int(os.environ.get('PREDICT_CACHE_SIZE', 256))
+    PREDICT_CACHE_TTL = float(os.environ.get('PREDICT_CACHE_TTL', 3600))  # секунды
+
+    # Предрасчет прогнозов после каждого обновления свечей
+    PRECOMPUTE_FORECASTS = os.environ.get('PRECOMPUTE_FORECASTS', 'false').lower() in ('1', 'true', 'yes')
+    PRECOMPUTE_HORIZONS = [int(i) for i in os.environ.get('PRECOMPUTE_HORIZONS', '1,6,24').split(',')]  # часы
+
+    # Разметка тренда: изменение цены за период в процентах выше UP - рост, ниже DOWN - падение
+    TREND_UP_THRESHOLD = float(os.environ.get('TREND_UP_THRESHOLD', 0.1))
+    TREND_DOWN_THRESHOLD = float(os.environ.get('TREND_DOWN_THRESHOLD', -0.1))
+    LABEL_CACHE_DIR = os.environ.get('LABEL_CACHE_DIR', 'app/ml_models/cache/labels')
+
+    # Чем считать прогноз: auto - облегченная модель .tflite, если она есть и свежее .keras; tflite; keras
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'auto')
+
+    # Квантованные копии .tflite при экспорте, через запятую: dynamic, float16, int8. По умолчанию - только float32
+    EXPORT_QUANTIZATION = [i.strip() for i in os.environ.get('EXPORT_QUANTIZATION', '').split(',') if i.strip()]
+    QUANT_CALIBRATION_SAMPLES = int(os.environ.get('QUANT_CALIBRATION_SAMPLES', 200))  # окон для калибровки int8
+    QUANT_REPORT_SAMPLES = int(os.environ.get('QUANT_REPORT_SAMPLES', 500))  # тестовых окон для отчета о потерях
+    # Какую копию брать для прогноза, по виду модели: 'trend=dynamic,stock=float16'. Без записи - float32
+    INFERENCE_QUANTIZATION = dict(i.strip().split('=', 1) for i in
+                                  os.environ.get('INFERENCE_QUANTIZATION', '').split(',') if '=' in i)
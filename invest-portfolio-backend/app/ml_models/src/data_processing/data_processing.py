@@ -1,11 +1,18 @@
 import pandas as pd
 import numpy as np
-import talib
+
+from app.config import Config
 
 
 class DataProcessing:
 
+    FEATURES = ['sma_20', 'atr', 'trend', 'log_close', 'log_open', 'log_high',
+                'log_low', 'previous_log_close']
+
     def prepare_data(self, df: pd.DataFrame):
+        # TA-Lib нужен только обучению: прогноз считает индикаторы через IndicatorEngine
+        import talib
+
         df = df.copy()
 
         df['close'] = pd.to_numeric(df['close'], errors='coerce')
@@ -49,16 +56,9 @@ class DataProcessing:
         # df['macd_signal'] = macdsignal
         # df['macd_hist'] = macdhist
 
-        print(df.head(5))
-
         df = df.dropna()
 
-        print(df.head(5))
-
-        columns = ['sma_20', 'atr', 'trend', 'log_close', 'log_open', 'log_high',
-                   'log_low', 'previous_log_close']
-
-        return df[columns]
+        return df[self.FEATURES]
 
     def add_target(self, df: pd.DataFrame):
         df = df.copy()
@@ -66,23 +66,10 @@ class DataProcessing:
         columns = ['log_close', 'log_open', 'log_high', 'log_low']
         return df[columns].shift(1)
 
-    def prepare_trend(self, df, period: int):
-        df = df.copy()
-
+    def prepare_trend(self, df, period: int, up=Config.TREND_UP_THRESHOLD, down=Config.TREND_DOWN_THRESHOLD):
         future_price = df['close'].shift(-period)
 
-        price_change = (future_price / df['close'] - 1) * 100
-
-        up = 0.1
-        down = -0.1
-
-        target = []
-        for change in price_change:
-            if change > up:
-                target.append(1)
-            elif change < down:
-                target.append(-1)
-            else:
-                target.append(0)
+        price_change = ((future_price / df['close'] - 1) * 100).to_numpy()
 
-        return np.array(target)
+        # NaN в конце ряда не проходит ни одно сравнение и получает 0, как и раньше
+        return np.select([price_change > up, price_change < down], [1, -1], 0)
@@ -1,5 +1,8 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.config import Config
 
 
 class DataProcessingTrend:
@@ -31,38 +34,52 @@ class DataProcessingTrend:
 
         return matrice
 
-    def prepare_data(self, df: pd.DataFrame, length, width):
+    def rasterize(self, open, close, length, width, dtype=np.uint8):
+        # Все окна сразу: то же, что create_matrice для каждого окна, но через broadcasting.
+        # Уровни строк считаются накопительной суммой, как в create_matrice (a += step),
+        # поэтому результат совпадает побитово
+        open = np.asarray(open, dtype=float)
+        close = np.asarray(close, dtype=float)
 
-        close = df['close'].tolist()
-        open = df['open'].tolist()
+        if len(close) < length:
+            return np.zeros((0, width, length), dtype=dtype)
 
-        list_matrice = []
-        # формируем матрицы
-        for i in range(len(close) - length + 1):
+        open_windows = sliding_window_view(open, length)
+        close_windows = sliding_window_view(close, length)
 
-            matrice = self.create_matrice(open[i:i + length], close[i:i + length], length, width)
-            list_matrice.append(matrice)
+        mx = np.maximum(open_windows.max(axis=1), close_windows.max(axis=1))
+        mm = np.minimum(open_windows.min(axis=1), close_windows.min(axis=1))
+        step = (mx - mm) / width
 
-        return np.array(list_matrice)
+        levels = np.empty((len(mm), width))
+        levels[:, 0] = mm
+        levels[:, 1:] = step[:, np.newaxis]
+        levels = np.cumsum(levels, axis=1)[:, :, np.newaxis]
 
-    def add_target(self, df, period: int):
-        df = df.copy()
+        up_value = np.maximum(open_windows, close_windows)[:, np.newaxis, :]
+        low_value = np.minimum(open_windows, close_windows)[:, np.newaxis, :]
 
-        future_price = df['close'].shift(period)
+        return ((levels >= low_value) & (levels <= up_value)).astype(dtype)
 
-        price_change = (future_price / df['close'] - 1) * 100
+    def prepare_data(self, df: pd.DataFrame, length, width, dtype=np.uint8, packed=False):
+        # packed=True упаковывает матрицы по битам вдоль оси свечей (14 свечей - 2 байта вместо 14),
+        # распаковка - unpack_data
+        matrices = self.rasterize(df['open'].to_numpy(), df['close'].to_numpy(), length, width, dtype)
 
-        # Строгость отбора позитивного и негативного тренда
-        up = 0.1
-        down = -0.1
+        if packed:
+            return np.packbits(matrices.astype(np.uint8), axis=-1)
+        return matrices
 
-        target = []
-        for change in price_change:
-            if change > up:
-                target.append([1, 0, 0])
-            elif change < down:
-                target.append([0, 0, 1])
-            else:
-                target.append([0, 1, 0])
+    @staticmethod
+    def unpack_data(packed, length, dtype=np.uint8):
+        return np.unpackbits(packed, axis=-1, count=length).astype(dtype)
+
+    def add_target(self, df, period: int, up=Config.TREND_UP_THRESHOLD, down=Config.TREND_DOWN_THRESHOLD):
+        future_price = df['close'].shift(period)
+
+        price_change = ((future_price / df['close'] - 1) * 100).to_numpy()
+
+        # Классы [рост, флэт, падение]; one-hot - строки единичной матрицы по номеру класса
+        classes = np.select([price_change > up, price_change < down], [0, 2], 1)
 
-        return np.array(target)
+        return np.eye(3, dtype=int)[classes]
@@ -0,0 +1,50 @@
+import joblib
+import numpy as np
+
+
+class FeaturePipeline:
+    # Стандартизация с параметрами, посчитанными один раз при обучении и сохраненными вместе с моделью.
+    # На инференсе это одно аффинное преобразование (x - mean) / scale без повторного обучения;
+    # хранит только массивы numpy, поэтому для загрузки не нужен sklearn
+
+    def __init__(self, mean=None, scale=None):
+        self.mean = None
+        self.scale = None
+
+        if mean is not None:
+            self._set(mean, scale)
+
+    def _set(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        # Скейлеры старых моделей (sklearn StandardScaler) переводятся без изменения параметров
+        return cls(scaler.mean_, scaler.scale_)
+
+    def fit(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        scale = x.std(axis=0)
+        # Константная колонка не масштабируется, как в StandardScaler
+        scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+
+        self._set(x.mean(axis=0), scale)
+        return self
+
+    def transform(self, x):
+        return (np.asarray(x, dtype=np.float64) - self.mean) / self.scale
+
+    def fit_transform(self, x):
+        return self.fit(x).transform(x)
+
+    def inverse_transform(self, x):
+        return np.asarray(x, dtype=np.float64) * self.scale + self.mean
+
+
+def load_scalers(path) -> dict:
+    scalers = joblib.load(path)
+
+    # Модели, обученные до появления FeaturePipeline, хранят StandardScaler
+    return {key: value if isinstance(value, FeaturePipeline) else FeaturePipeline.from_scaler(value)
+            for key, value in scalers.items()}
@@ -0,0 +1,150 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from app.config import Config
+from app.ml_models.src.data_processing.data_processing import DataProcessing
+
+
+class RollingStats:
+    # Скользящее окно из n значений: сумма для среднего и дисперсия Уэлфорда, обновление за O(1)
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque()
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.same = 0  # сколько последних значений подряд одинаковы
+
+    def push(self, x):
+        if len(self.values) == self.n:
+            y = self.values.popleft()
+            self.total -= y
+            if self.values:
+                delta = y - self.mean
+                self.mean -= delta / len(self.values)
+                self.m2 -= delta * (y - self.mean)
+            else:
+                self.mean = self.m2 = 0.0
+
+        self.same = self.same + 1 if self.values and self.values[-1] == x else 1
+
+        self.values.append(x)
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def full(self):
+        return len(self.values) == self.n
+
+    def sma(self):
+        return self.total / self.n if self.full else math.nan
+
+    def std(self):
+        # Выборочное стандартное отклонение (ddof=1), как у pandas rolling().std().
+        # Окно из одинаковых значений - ровно 0, без остатка округления в m2
+        if not self.full:
+            return math.nan
+        if self.same >= self.n:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.n - 1))
+
+
+class IndicatorEngine:
+    # Признаки DataProcessing.prepare_data, пересчитываемые на каждую новую свечу за O(1):
+    # скользящие суммы для SMA, дисперсия Уэлфорда для волатильности, сглаживание Уайлдера для ATR.
+    # Хранит только последние length + 1 свечей - этого хватает на окно признаков для модели
+
+    ATR_PERIOD = 14
+
+    def __init__(self, length=24, up=Config.TREND_UP_THRESHOLD, down=Config.TREND_DOWN_THRESHOLD):
+        self.length = length
+        self.up = up
+        self.down = down
+
+        self._previous = None
+        self._sma_20 = RollingStats(20)
+        self._ma_10 = RollingStats(10)
+        self._volatility_5 = RollingStats(5)
+        self._volatility_20 = RollingStats(20)
+
+        self._tr = RollingStats(self.ATR_PERIOD)
+        self._atr = math.nan
+
+        # (close, log_close, log_open, log_high, log_low, sma_20, atr, прогреты ли все индикаторы)
+        self._rows = deque(maxlen=length + 1)
+
+    def update(self, open, high, low, close):
+        open, high, low, close = float(open), float(high), float(low), float(close)
+        log_close = log_open = log_high = log_low = math.nan
+
+        self._sma_20.push(close)
+
+        if self._previous is not None:
+            open_, high_, low_, close_ = self._previous
+
+            log_close = math.log(close / close_)
+            log_open = math.log(open / open_)
+            log_low = math.log(low / low_)
+            log_high = math.log(high / high_)
+
+            for stats in (self._ma_10, self._volatility_5, self._volatility_20):
+                stats.push(log_close)
+
+            # ATR как в TA-Lib: первое значение - среднее 14 истинных диапазонов, дальше сглаживание Уайлдера
+            tr = max(high - low, abs(high - close_), abs(low - close_))
+            if self._tr.full:
+                self._atr = (self._atr * (self.ATR_PERIOD - 1) + tr) / self.ATR_PERIOD
+            else:
+                self._tr.push(tr)
+                if self._tr.full:
+                    self._atr = self._tr.sma()
+
+        self._previous = (open, high, low, close)
+
+        sma_20 = self._sma_20.sma()
+        ready = not math.isnan(self._atr) and self._ma_10.full and self._volatility_20.full and \
+            not math.isnan(sma_20)
+
+        self._rows.append((close, log_close, log_open, log_high, log_low, sma_20, self._atr, ready))
+
+    def indicators(self) -> dict:
+        # Причинные индикаторы последней свечи, включая те, что в окно модели не попадают
+        close, log_close, log_open, log_high, log_low, sma_20, atr, ready = self._rows[-1]
+        return {
+            'log_close': log_close, 'log_open': log_open, 'log_high': log_high, 'log_low': log_low,
+            'ma_10': self._ma_10.sma(), 'volatility_5': self._volatility_5.std(),
+            'volatility_20': self._volatility_20.std(), 'sma_20': sma_20, 'atr': atr
+        }
+
+    def _label(self, close, future_close):
+        change = (future_close / close - 1) * 100
+        if change > self.up:
+            return 1
+        if change < self.down:
+            return -1
+        return 0
+
+    def features(self) -> np.ndarray:
+        # Строки в порядке и с колонками DataProcessing.FEATURES. previous_log_close и trend
+        # заглядывают на свечу вперед, поэтому последняя свеча в окно не входит, а у предпоследней
+        # trend = 0 - так же, как после shift в prepare_data
+        rows = self._rows
+        features = []
+
+        for t in range(len(rows) - 1):
+            close, log_close, log_open, log_high, log_low, sma_20, atr, ready = rows[t]
+            previous_log_close = rows[t + 1][1]
+
+            if not ready or math.isnan(previous_log_close):
+                continue
+
+            trend = self._label(rows[t + 1][0], rows[t + 2][0]) if t + 2 < len(rows) else 0
+
+            features.append((sma_20, atr, trend, log_close, log_open, log_high, log_low, previous_log_close))
+
+        return np.array(features[-self.length:], dtype=np.float64).reshape(-1, len(DataProcessing.FEATURES))
@@ -0,0 +1,53 @@
+import json
+import os
+import zlib
+
+import numpy as np
+
+from app.config import Config
+
+
+class LabelCache:
+    # Разметка для обучения, сохраненная на диске: один файл на (вид разметки, тикер).
+    # Ключ - параметры разметки, диапазон дат и контрольная сумма цен закрытия: повторное обучение
+    # на тех же свечах берет метки из файла, а новые или обновленные свечи дают новый ключ и перезапись
+
+    def __init__(self, directory=Config.LABEL_CACHE_DIR):
+        self.directory = directory
+
+    @staticmethod
+    def key(df, params: dict) -> str:
+        close = np.ascontiguousarray(df['close'].to_numpy(dtype=np.float64))
+        dates = [str(df['ts'].iloc[0]), str(df['ts'].iloc[-1])] if 'ts' in df and len(df) else None
+
+        return json.dumps({**params, 'dates': dates, 'rows': len(df), 'close_crc': zlib.crc32(close.tobytes())},
+                          sort_keys=True)
+
+    def get(self, kind, ticker, df, params: dict, compute):
+        # compute - функция без аргументов, размечает df при промахе
+        key = self.key(df, params)
+        path = os.path.join(self.directory, f'{kind}_{ticker}.npz')
+
+        try:
+            with np.load(path) as data:
+                if str(data['key']) == key:
+                    return data['labels']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f'Кэш разметки {path} не прочитан: {e}')
+
+        labels = compute()
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + '.tmp', 'wb') as file:
+                np.savez(file, key=np.array(key), labels=labels)
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            print(f'Кэш разметки {path} не сохранен: {e}')
+
+        return labels
+
+
+label_cache = LabelCache()
@@ -0,0 +1,245 @@
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from app.config import Config
+
+
+# Облегченная копия модели для инференса лежит рядом с .keras: ml_stock_sber_model.keras -> ml_stock_sber_model.tflite,
+# квантованные копии - ml_stock_sber_model.float16.tflite и т.д.
+# Модуль не импортирует TensorFlow на уровне модуля: для запуска .tflite хватает пакета ai-edge-litert
+
+MODEL_DIRS = ['app/ml_models/models/trend_train_models', 'app/ml_models/models/stock_train_models']
+
+# dynamic - веса int8, активации float; float16 - веса float16; int8 - веса и активации int8 по калибровке
+QUANTIZATIONS = ('dynamic', 'float16', 'int8')
+
+
+def tflite_path(path, quantization=None):
+    return path.replace('.keras', f'.{quantization}.tflite' if quantization else '.tflite')
+
+
+def report_path(path):
+    return path.replace('.keras', '_quantization.json')
+
+
+def _convert(saved_model_dir, quantization=None, calibration_path=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+
+    if quantization:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    if quantization == 'int8':
+        # Диапазоны активаций по окнам обучающей выборки; операции без int8-ядра остаются во float
+        calibration = np.load(calibration_path)
+        converter.representative_dataset = lambda: ([x[np.newaxis].astype(np.float32)] for x in calibration)
+
+    return converter.convert()
+
+
+def _convert_isolated(saved_model_dir, quantization, calibration_path):
+    # Калибровка int8 может уронить процесс целиком (у LSTM - segfault в калибраторе TFLite),
+    # поэтому она идет в отдельном процессе: при падении теряется только этот вариант
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        try:
+            return executor.submit(_convert, saved_model_dir, quantization, calibration_path).result()
+        except BrokenProcessPool:
+            raise RuntimeError('процесс конвертации завершился аварийно')
+
+
+def atomic_save(path, save, tmp_path=None):
+    # Пишем во временный файл и подменяем, чтобы загрузка модели не застала файл недописанным.
+    # save - функция, записывающая файл по переданному пути
+    tmp_path = tmp_path or path + '.tmp'
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write(export_path, content):
+    def save(tmp_path):
+        with open(tmp_path, 'wb') as file:
+            file.write(content)
+
+    atomic_save(export_path, save)
+
+
+def export_tflite(model, path, quantizations=(), calibration=None):
+    # Конвертация через SavedModel с батчем 1 - прогноз всегда считается по одному окну.
+    # calibration - окна обучающей выборки формы (n, *model.input_shape[1:]), нужны только для int8
+    import keras
+
+    saved_model_dir = tempfile.mkdtemp()
+    try:
+        model.export(saved_model_dir, format='tf_saved_model', verbose=False,
+                     input_signature=[keras.InputSpec(shape=(1,) + tuple(model.input_shape[1:]), dtype='float32')])
+
+        export_paths = [tflite_path(path)]
+        _write(export_paths[0], _convert(saved_model_dir))
+
+        for quantization in quantizations:
+            try:
+                if quantization == 'int8':
+                    if calibration is None or not len(calibration):
+                        raise ValueError('нет окон для калибровки')
+
+                    calibration_path = os.path.join(saved_model_dir, 'calibration.npy')
+                    np.save(calibration_path, np.asarray(calibration, dtype=np.float32).reshape(
+                        (-1,) + tuple(model.input_shape[1:])))
+                    content = _convert_isolated(saved_model_dir, quantization, calibration_path)
+                else:
+                    content = _convert(saved_model_dir, quantization)
+
+                export_paths.append(tflite_path(path, quantization))
+                _write(export_paths[-1], content)
+
+            except Exception as e:
+                print(f'Модель {path} не квантована ({quantization}): {e!r}')
+    finally:
+        shutil.rmtree(saved_model_dir, ignore_errors=True)
+
+    return export_paths
+
+
+def save_tflite(model, path, calibration=None):
+    # Облегченная копия для инференса рядом с сохраненной моделью; без нее прогноз работает на модели Keras.
+    # calibration - окна обучающей выборки для квантования int8
+    try:
+        export_tflite(model, path, Config.EXPORT_QUANTIZATION, calibration)
+    except Exception as e:
+        print(f'Модель {path} не экспортирована в TFLite: {e}')
+
+
+def calibration_sample(x_train, size=Config.QUANT_CALIBRATION_SAMPLES):
+    # Равномерная по времени выборка окон из обучающей части
+    index = np.linspace(0, len(x_train) - 1, min(size, len(x_train))).astype(int)
+    return np.asarray(x_train[index], dtype=np.float32)
+
+
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        # Без ai-edge-litert работает интерпретатор из TensorFlow, но тогда TensorFlow импортируется целиком
+        from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+def tflite_available(path, quantization=None) -> bool:
+    # .tflite моложе .keras - значит, экспорт сделан после последнего обучения
+    export_path = tflite_path(path, quantization)
+    return os.path.exists(export_path) and os.path.exists(path) and \
+        os.stat(export_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+
+
+class TFLiteModel:
+    # Вызывается как модель Keras: model(x) возвращает массив или словарь массивов по именам выходов.
+    # Интерпретатор TFLite не потокобезопасен, поэтому вызовы одной модели идут по очереди
+
+    def __init__(self, path):
+        self.path = path
+        self._interpreter = _interpreter_class()(model_path=path)
+        self._runner = self._interpreter.get_signature_runner('serving_default')
+        self._input = list(self._runner.get_input_details())[0]
+        self.input_shape = tuple(self._runner.get_input_details()[self._input]['shape'])
+        self._lock = threading.Lock()
+
+        outputs = self._runner.get_output_details()
+        self._single_output = list(outputs)[0] if len(outputs) == 1 else None
+
+    def __call__(self, x):
+        with self._lock:
+            outputs = self._runner(**{self._input: x})
+
+        if self._single_output is not None:
+            return outputs[self._single_output]
+        return outputs
+
+
+def quantization_report(path, x_test, y_test, quantizations=Config.EXPORT_QUANTIZATION,
+                        size=Config.QUANT_REPORT_SAMPLES):
+    # Сравнение квантованных копий с float .tflite на тестовой выборке: размер файла, время вызова и
+    # точность тренд-модели (y_test - one-hot) или MAE сток-модели по каждому выходу (y_test - словарь)
+    index = np.linspace(0, len(x_test) - 1, min(size, len(x_test))).astype(int)
+    x_test = np.asarray(x_test[index], dtype=np.float32)
+    if isinstance(y_test, dict):
+        y_test = {key: np.asarray(value)[index] for key, value in y_test.items()}
+    else:
+        y_test = np.asarray(y_test)[index]
+
+    report = {'samples': len(x_test), 'variants': {}}
+
+    for quantization in (None,) + tuple(quantizations):
+        if not tflite_available(path, quantization):
+            continue
+
+        export_path = tflite_path(path, quantization)
+        model = TFLiteModel(export_path)
+        # Окна обучения тренд-модели хранятся без оси канала - приводим к входу модели
+        windows = x_test.reshape((-1,) + model.input_shape)
+        model(windows[0])
+
+        begin = time.perf_counter()
+        outputs = [model(x) for x in windows]
+        latency = (time.perf_counter() - begin) / len(x_test)
+
+        row = {'size': os.path.getsize(export_path), 'latency_ms': round(latency * 1e3, 4)}
+
+        if isinstance(y_test, dict):
+            row['mae'] = {key: float(np.mean(np.abs(np.array([np.asarray(out[key]).ravel()[0] for out in outputs]) -
+                                                    value))) for key, value in y_test.items()}
+        else:
+            predicted = np.array([np.asarray(out).argmax() for out in outputs])
+            row['accuracy'] = float(np.mean(predicted == y_test.argmax(axis=1)))
+
+        report['variants'][quantization or 'float32'] = row
+
+    # Потери относительно float32: рост MAE и падение точности, размер и время - во сколько раз меньше
+    base = report['variants'].get('float32')
+    for name, row in report['variants'].items():
+        if base is None or name == 'float32':
+            continue
+
+        row['size_ratio'] = round(base['size'] / row['size'], 2)
+        row['speedup'] = round(base['latency_ms'] / row['latency_ms'], 2)
+        if 'mae' in row:
+            row['mae_increase'] = {key: row['mae'][key] - base['mae'][key] for key in row['mae']}
+        else:
+            row['accuracy_drop'] = base['accuracy'] - row['accuracy']
+
+    with open(report_path(path), 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    return report
+
+
+def export_all(model_dirs=MODEL_DIRS, quantizations=Config.EXPORT_QUANTIZATION):
+    # Экспорт уже обученных моделей, у которых еще нет актуального .tflite.
+    # Окон для калибровки здесь нет, поэтому int8 создается только при обучении
+    import keras
+
+    for path in sorted(path for model_dir in model_dirs for path in glob.glob(os.path.join(model_dir, '*.keras'))):
+        missing = [i for i in quantizations if i != 'int8' and not tflite_available(path, i)]
+        if path.endswith('.tmp.keras') or (tflite_available(path) and not missing):
+            continue
+
+        try:
+            print('Экспорт', ', '.join(export_tflite(keras.models.load_model(path), path, missing)))
+        except Exception as e:
+            print(f'Ошибка экспорта модели {path}: {e}')
+
+
+if __name__ == '__main__':
+    # Запуск из директории 'invest-portfolio-backend': python -m app.ml_models.src.model.export_model
+    export_all()
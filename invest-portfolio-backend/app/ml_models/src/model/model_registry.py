@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+
+from app.config import Config
+
+
+class ModelRegistry:
+    # Загруженные модели живут в памяти между запросами. Ключ записи - (тип модели, тикер),
+    # вместе с моделью хранится версия файлов (mtime и размер): если переобучение перезаписало файл,
+    # модель перечитывается и подменяется целиком. Сверх max_models вытесняется давно не использованная
+
+    def __init__(self, max_models=Config.MODEL_REGISTRY_SIZE):
+        self.max_models = max_models
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @staticmethod
+    def version(paths):
+        version = []
+        for path in paths:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    def _cached(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def get(self, key, paths, loader):
+        # paths - файлы, от которых зависит модель; loader - функция загрузки без аргументов
+        version = self.version(paths)
+
+        value = self._cached(key, version)
+        if value is not None:
+            return value
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Один поток грузит модель, остальные ждут и берут уже загруженную
+        with load_lock:
+            version = self.version(paths)
+
+            value = self._cached(key, version)
+            if value is not None:
+                return value
+
+            value = loader()
+
+            with self._lock:
+                self._entries[key] = (version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_models:
+                    self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+model_registry = ModelRegistry()
@@ -2,15 +2,34 @@ import pandas as pd
 import numpy as np
 import os
 import keras
-from sklearn.preprocessing import StandardScaler
 from sklearn.utils.class_weight import compute_class_weight
 from keras.callbacks import (
     ReduceLROnPlateau, EarlyStopping, ModelCheckpoint
 )
 
 import joblib
+from numpy.lib.stride_tricks import sliding_window_view
 
+from app.ml_models.src.model.export_model import atomic_save, save_tflite
 from app.ml_models.src.data_processing.data_processing import DataProcessing
+from app.ml_models.src.data_processing.feature_pipeline import FeaturePipeline, load_scalers
+
+
+class WindowDataset(keras.utils.PyDataset):
+
+    def __init__(self, x_data, y_data: dict, batch_size=32, **kwargs):
+        super().__init__(**kwargs)
+        self.x_data = x_data
+        self.y_data = y_data
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return int(np.ceil(len(self.x_data) / self.batch_size))
+
+    def __getitem__(self, idx):
+        batch = slice(idx * self.batch_size, (idx + 1) * self.batch_size)
+        return (np.ascontiguousarray(self.x_data[batch]),
+                {key: value[batch] for key, value in self.y_data.items()})
 
 
 class TrainModel:
@@ -25,42 +44,29 @@ class TrainModel:
 
         x_data = x_data.values
 
-        x_data, y_data = self._create_sequences(x_data, y_data, lookback=24)
+        lookback = 24
+        n_windows = len(x_data) - lookback
 
-        print(len(x_data))
+        train_size, val_size = int(0.8 * n_windows), int(0.1 * n_windows)
 
-        train_size, val_size = int(0.8 * len(x_data)), int(0.1 * len(x_data))
+        # Скейлер фич обучается на строках, которые попадают в обучающие окна, и применяется
+        # к исходной таблице один раз - окна потом берутся как представления без копирования
+        self.scalers['feature'] = FeaturePipeline()
+        self.scalers['feature'].fit(x_data[:train_size + lookback - 1])
+        x_data = self.scalers['feature'].transform(x_data)
+
+        x_data, y_data = self._create_sequences(x_data, y_data, lookback=lookback)
 
         x_train = x_data[:train_size]
         y_train = y_data[:train_size]
 
-        print(len(x_train), len(y_train))
-
         x_val = x_data[train_size: train_size + val_size]
         y_val = y_data[train_size: train_size + val_size]
 
-        print(len(x_val), len(y_val))
-
         x_test = x_data[train_size + val_size:]
         y_test = y_data[train_size + val_size:]
 
-        print(len(x_test), len(y_test))
-
-        self.scalers['feature'] = StandardScaler()
-
-        x_train_reshape = x_train.reshape(-1, x_train.shape[-1])
-        x_train_scaled = self.scalers['feature'].fit_transform(x_train_reshape)
-        x_train = x_train_scaled.reshape(x_train.shape)
-
-        x_val_reshape = x_val.reshape(-1, x_val.shape[-1])
-        x_val_scaled = self.scalers['feature'].fit_transform(x_val_reshape)
-        x_val = x_val_scaled.reshape(x_val.shape)
-
-        x_test_reshape = x_test.reshape(-1, x_test.shape[-1])
-        x_test_scaled = self.scalers['feature'].fit_transform(x_test_reshape)
-        x_test = x_test_scaled.reshape(x_test.shape)
-
-        self.scalers['target'] = StandardScaler()
+        self.scalers['target'] = FeaturePipeline()
         y_train = self.scalers['target'].fit_transform(y_train)
         y_val = self.scalers['target'].transform(y_val)
         y_test = self.scalers['target'].transform(y_test)
@@ -89,17 +95,15 @@ class TrainModel:
         return (x_train, y_train_dict), (x_val, y_val_dict), (x_test, y_test_dict), (train_size, val_size)
 
     def _create_sequences(self, X_data: np.ndarray, y_data: np.ndarray, lookback: int) -> tuple:
-        X_seq, y_seq = [], []
+        # Окно i - строки [i, i + lookback), цель - строка i + lookback.
+        # sliding_window_view возвращает представление исходного массива, данные не копируются
+        X_seq = sliding_window_view(X_data[:-1], lookback, axis=0).transpose(0, 2, 1)
+        y_seq = y_data[lookback:]
 
-        for i in range(lookback, len(X_data)):
-            # Входные фичи (только фичи, без целей)
-            X_seq.append(X_data[i - lookback:i, :])
-            # Целевые переменные (текущий временной шаг)
-            y_seq.append(y_data[i, :])
+        return X_seq, y_seq
 
-        return np.array(X_seq), np.array(y_seq)
-
-    def train_model(self, train, val, model, epoch):
+    def train_model(self, train, val, model, epoch, extra_callbacks=None,
+                    checkpoint_path='models/checkpoint/best_model.keras'):
         x_train, y_train = train
         x_val, y_val = val
 
@@ -111,7 +115,7 @@ class TrainModel:
                 verbose=1
             ),
             ModelCheckpoint(
-                filepath='models/checkpoint/best_model.keras',
+                filepath=checkpoint_path,
                 monitor='val_loss',
                 save_best_only=True,
                 verbose=1
@@ -125,11 +129,13 @@ class TrainModel:
             )
         ]
 
+        callbacks += extra_callbacks or []
+
+        # Батчи собираются из окон-представлений по мере обучения, весь тензор окон в памяти не создается
         history = model.fit(
-            x_train, y_train,
-            batch_size=32,
+            WindowDataset(x_train, y_train, batch_size=32),
             epochs=epoch,
-            validation_data=(x_val, y_val),
+            validation_data=WindowDataset(x_val, y_val, batch_size=32),
             callbacks=callbacks,
             verbose=1,
             shuffle=False
@@ -137,18 +143,20 @@ class TrainModel:
 
         return history
 
-    def save_model(self, model, path='models/stock_train_models/ml_stock_model.keras'):
+    def save_model(self, model, path='models/stock_train_models/ml_stock_model.keras', calibration=None):
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        model.save(path)
         scaler_path = path.replace('.keras', '_scalers.pkl')
-        joblib.dump(self.scalers, scaler_path)
+
+        # Keras определяет формат по расширению, поэтому временный файл тоже .keras
+        atomic_save(path, model.save, path.replace('.keras', '.tmp.keras'))
+        atomic_save(scaler_path, lambda tmp_path: joblib.dump(self.scalers, tmp_path))
+
+        save_tflite(model, path, calibration)
         print(f"Модель сохранена: {path}")
         print(f"Скейлеры сохранены: {scaler_path}")
 
     def load_model(self, path='models/stock_train_models/ml_stock_model.keras'):
         model = keras.models.load_model(path)
-        scaler_path = path.replace('.keras', '_scalers.pkl')
-
-        scalers = joblib.load(scaler_path)
+        scalers = load_scalers(path.replace('.keras', '_scalers.pkl'))
 
         return model, scalers
@@ -8,21 +8,29 @@ from keras.callbacks import (
     ReduceLROnPlateau, EarlyStopping, ModelCheckpoint
 )
 
+from app.config import Config
+from app.ml_models.src.model.export_model import atomic_save, save_tflite
 from app.ml_models.src.data_processing.data_processing_trend import DataProcessingTrend
+from app.ml_models.src.data_processing.label_cache import label_cache
 
 
 class TrainModel:
     def __init__(self):
         self.scalers = {}
 
-    def prepare_data(self, df: pd.DataFrame):
+    def prepare_data(self, df: pd.DataFrame, ticker=None):
         df = df.copy()
 
         x_data = DataProcessingTrend().prepare_data(df, 14, 100)
-        y_data = DataProcessingTrend().add_target(df[13:], 1)
 
-        print(x_data.shape)
-        print(y_data)
+        # С тикером метки берутся из кэша разметки, если свечи не изменились с прошлого обучения
+        target_df = df[13:]
+        params = {'period': 1, 'up': Config.TREND_UP_THRESHOLD, 'down': Config.TREND_DOWN_THRESHOLD}
+
+        def compute():
+            return DataProcessingTrend().add_target(target_df, params['period'], params['up'], params['down'])
+
+        y_data = label_cache.get('trend', ticker, target_df, params, compute) if ticker else compute()
 
         train_size, val_size = int(0.8 * len(x_data)), int(0.1 * len(x_data))
 
@@ -37,7 +45,8 @@ class TrainModel:
 
         return (x_train, y_train), (x_val, y_val), (x_test, y_test)
 
-    def train_model(self, train, val, model, epoch):
+    def train_model(self, train, val, model, epoch, extra_callbacks=None,
+                    checkpoint_path='models/checkpoint/best_model.keras'):
         x_train, y_train = train
         x_val, y_val = val
 
@@ -49,7 +58,7 @@ class TrainModel:
                 verbose=1
             ),
             ModelCheckpoint(
-                filepath='models/checkpoint/best_model.keras',
+                filepath=checkpoint_path,
                 monitor='val_loss',
                 save_best_only=True,
                 verbose=1
@@ -63,6 +72,8 @@ class TrainModel:
             )
         ]
 
+        callbacks += extra_callbacks or []
+
         class_weight = self.add_class_weight(y_train)
 
         history = model.fit(
@@ -78,9 +89,13 @@ class TrainModel:
 
         return history
 
-    def save_model(self, model, path='models/trend_train_models/ml_trend_model.keras'):
+    def save_model(self, model, path='models/trend_train_models/ml_trend_model.keras', calibration=None):
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        model.save(path)
+
+        # Keras определяет формат по расширению, поэтому временный файл тоже .keras
+        atomic_save(path, model.save, path.replace('.keras', '.tmp.keras'))
+
+        save_tflite(model, path, calibration)
 
     def load_model(self, path='models/trend_train_models/ml_trend_model.keras'):
         model = keras.models.load_model(path)
@@ -0,0 +1,30 @@
+import time
+
+import keras
+
+
+class TrainJobProgress(keras.callbacks.Callback):
+    # Переносит номер эпохи, метрики и оценку оставшегося времени в задачу обучения
+
+    def __init__(self, job, stage, epochs):
+        super().__init__()
+        self.job = job
+        self.stage = stage
+        self.epochs = epochs
+        self._begin = None
+
+    def on_train_begin(self, logs=None):
+        self._begin = time.monotonic()
+        self.job.stage = self.stage
+        self.job.epoch = 0
+        self.job.epochs = self.epochs
+        self.job.metrics = {}
+        self.job.eta_seconds = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.job.epoch = epoch + 1
+        self.job.metrics = {key: float(value) for key, value in (logs or {}).items()}
+
+        # Верхняя оценка: EarlyStopping может закончить обучение раньше
+        per_epoch = (time.monotonic() - self._begin) / self.job.epoch
+        self.job.eta_seconds = round(per_epoch * (self.epochs - self.job.epoch), 1)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+
+@dataclass
+class TrainJobModel:
+    id: str
+    ticker: str
+    status: str  # queued, running, done, failed
+    stage: Optional[str] = None  # trend, stock
+    epoch: int = 0
+    epochs: int = 0
+    metrics: Dict[str, float] = field(default_factory=dict)
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'ticker': self.ticker,
+            'status': self.status,
+            'stage': self.stage,
+            'epoch': self.epoch,
+            'epochs': self.epochs,
+            'metrics': self.metrics,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'eta_seconds': self.eta_seconds,
+            'error': self.error
+        }
@@ -0,0 +1,74 @@
+from flask import request
+from flask_restx import Namespace, Resource, fields
+
+from app.services.ml_train_service import MlTrainService
+from app.services.stock_names_service import StockNamesService
+
+
+api = Namespace('dti', description='Операции с портфелем')
+
+train_input_model = api.model('TrainInput', {
+    'ticker_id': fields.Integer(required=True, description='Айди актива'),
+    'force': fields.Boolean(required=False, description='Переобучить, даже если модели уже есть')
+})
+
+
+@api.route('/ml_train')
+class TrainRoute(Resource):
+
+    @api.doc('create_train_job')
+    @api.expect(train_input_model)
+    @api.response(202, 'Задача обучения поставлена в очередь')
+    @api.response(404, 'Актив не найден')
+    def post(self):
+        try:
+            data = request.get_json()
+
+            name = StockNamesService.GetName(data['ticker_id'])
+            if not name:
+                return {
+                    'success': False,
+                    'message': 'Актив не найден'
+                }, 404
+
+            job = MlTrainService.Submit(name.lower(), force=data.get('force', False))
+
+            return {
+                'success': True,
+                'data': job.to_dict()
+            }, 202
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Ошибка при запуске обучения: {str(e)}'
+            }, 500
+
+
+@api.route('/ml_train/<string:job_id>')
+@api.param('job_id', 'Айди задачи обучения')
+class TrainJobRoute(Resource):
+
+    @api.doc('get_train_job')
+    @api.response(200, 'Состояние задачи успешно получено')
+    @api.response(404, 'Задача не найдена')
+    def get(self, job_id):
+        try:
+            job = MlTrainService.GetJob(job_id)
+
+            if job:
+                return {
+                    'success': True,
+                    'data': job.to_dict()
+                }, 200
+
+            return {
+                'success': False,
+                'message': 'Задача не найдена'
+            }, 404
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Ошибка при получении задачи обучения: {str(e)}'
+            }, 500
@@ -2,7 +2,9 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 
 from app.services.ml_predict_service import MlPredictService
+from app.services.ml_train_service import MlTrainService
 from app.services.stock_names_service import StockNamesService
+from app.utils.prediction_cache import prediction_cache
 
 
 api = Namespace('dti', description='Операции с портфелем')
@@ -19,16 +21,31 @@ class PredictRoute(Resource):
     @api.doc('get_prediction')
     @api.expect(predict_input_model)
     @api.response(200, 'Успешное получение прогноза')
+    @api.response(202, 'Модель обучается, прогноз будет доступен после обучения')
+    @api.response(404, 'Актив не найден')
     def post(self):
         try:
             data = request.get_json()
 
             ticker_id, hours = data['ticker_id'], data['hours']
-            ticker = StockNamesService.GetOneById(ticker_id).name.lower()
+            name = StockNamesService.GetName(ticker_id)
+            if not name:
+                return {
+                    'success': False,
+                    'message': 'Актив не найден'
+                }, 404
+
+            ticker = name.lower()
+
+            job = MlTrainService.EnsureModels(ticker)
+            if job is not None:
+                return {
+                    'success': False,
+                    'message': 'Модель для актива обучается, повторите запрос позже',
+                    'job': job.to_dict()
+                }, 202
 
-            table_predict, trend_predict = MlPredictService().predict(hours, ticker)
-            print(1)
-            predict_model = MlPredictService().template_predict(table_predict, trend_predict, hours)
+            predict_model = MlPredictService.GetPredict(hours, ticker)
 
             if predict_model:
                 return {
@@ -41,3 +58,78 @@ class PredictRoute(Resource):
                 'success': False,
                 'message': f'Ошибка в прогнозирование: {str(e)}'
             }, 500
+
+
+predict_batch_input_model = api.model('PredictBatchInput', {
+    'ticker_ids': fields.List(fields.Integer, required=True, description='Айди активов'),
+    'hours': fields.List(fields.Integer, required=True, description='Горизонты прогноза в часах')
+})
+
+
+@api.route('/ml_predict/batch')
+class PredictBatchRoute(Resource):
+
+    @api.doc('get_prediction_batch')
+    @api.expect(predict_batch_input_model)
+    @api.response(200, 'Успешное получение прогнозов')
+    @api.response(202, 'Модели всех активов обучаются, прогнозы будут доступны после обучения')
+    @api.response(400, 'Некорректный список активов или горизонтов')
+    def post(self):
+        try:
+            data = request.get_json()
+
+            ticker_ids, horizons = data['ticker_ids'], sorted(set(data['hours']))
+            if not ticker_ids or not horizons or min(horizons) < 1:
+                return {
+                    'success': False,
+                    'message': 'Нужен хотя бы один актив и горизонт прогноза от 1 часа'
+                }, 400
+
+            # Имена всех активов одним запросом
+            names = {i.id: i.name.lower() for i in StockNamesService.GetAllNames() or []}
+
+            unknown = [ticker_id for ticker_id in ticker_ids if ticker_id not in names]
+            if unknown:
+                return {
+                    'success': False,
+                    'message': f'Активы не найдены: {unknown}'
+                }, 400
+
+            ready, training = [], []
+            for ticker_id in ticker_ids:
+                job = MlTrainService.EnsureModels(names[ticker_id])
+                if job is None:
+                    ready.append(ticker_id)
+                else:
+                    training.append({'ticker_id': ticker_id, 'job': job.to_dict()})
+
+            predictions = MlPredictService.GetPredictBatch([names[i] for i in ready], horizons) if ready else {}
+
+            return {
+                'success': bool(ready),
+                'data': [{
+                    'ticker_id': ticker_id,
+                    'ticker': names[ticker_id],
+                    'predictions': [model.to_dict() for hours, model in
+                                    sorted(predictions.get(names[ticker_id], {}).items())]
+                } for ticker_id in ready],
+                'training': training
+            }, 200 if ready else 202
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Ошибка в пакетном прогнозировании: {str(e)}'
+            }, 500
+
+
+@api.route('/ml_predict/cache')
+class PredictCacheRoute(Resource):
+
+    @api.doc('get_prediction_cache_stats')
+    @api.response(200, 'Статистика кэша прогнозов успешно получена')
+    def get(self):
+        return {
+            'success': True,
+            'data': prediction_cache.stats()
+        }, 200
@@ -1,5 +1,6 @@
 from flask_restx import Namespace, Resource, fields
 from app.services.stock_names_service import StockNamesService
+from app.routes.table_stock_route import candle_filter_params, parse_candle_filters, next_cursor
 
 api = Namespace('dti', description='Операции с портфелем')
 
@@ -13,17 +14,27 @@ stock_names_model = api.model('StockNames', {
 @api.param('name_id', 'Айди_названия')
 class StockNameById(Resource):
 
-    @api.doc('get_stock_name')
+    @api.doc('get_stock_name', params=candle_filter_params)
     @api.response(200, 'Название компании успешно получены')
+    @api.response(400, 'Неверные параметры запроса')
     @api.response(404, 'Название компании не найдено')
     def get(self, name_id):
         try:
-            data = StockNamesService.GetOneById(name_id)
+            try:
+                filters = parse_candle_filters()
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
+            data = StockNamesService.GetOneById(name_id, **filters)
 
             if data:
                 return {
                     'success': True,
-                    'data': data.to_dict()
+                    'data': data.to_dict(),
+                    'next_cursor': next_cursor(data.table, filters)
                 }, 200
 
             return {
@@ -1,6 +1,12 @@
-from flask import request
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import request, Response, stream_with_context
 from flask_restx import Namespace, Resource, fields
 from app.services.table_stock_service import TableStockService
+from database.db_connection import db_connection
 
 api = Namespace('dti', description='Операции с портфелем')
 
@@ -21,6 +27,66 @@ table_stock_create_model = api.model('TableStockCreate', {
 })
 
 
+candle_filter_params = {
+    'from': 'Начало периода',
+    'to': 'Конец периода',
+    'limit': 'Количество свечей на странице',
+    'cursor': 'Дата последней свечи предыдущей страницы (next_cursor)',
+    'interval': 'Интервал свечей: 1h (по умолчанию) или 1d'
+}
+
+
+def parse_int_arg(name, minimum=0):
+    # Целый параметр запроса не меньше minimum; неверное значение - ValueError, а не ошибка SQL
+    value = request.args.get(name)
+    if value is None:
+        return None
+
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'Параметр {name} должен быть целым числом')
+
+    if value < minimum:
+        raise ValueError(f'Параметр {name} должен быть не меньше {minimum}')
+    return value
+
+
+def parse_date_arg(name):
+    # Дата или дата со временем в формате ISO: 2024-01-31 или 2024-01-31 10:00:00
+    value = request.args.get(name)
+    if value is None:
+        return None
+
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Параметр {name} должен быть датой в формате ISO')
+    return value
+
+
+def parse_candle_filters():
+    filters = {
+        'begin_date': request.args.get('from'),
+        'end_date': request.args.get('to'),
+        'limit': parse_int_arg('limit', minimum=1),
+        'page_cursor': parse_date_arg('cursor'),
+        'interval': request.args.get('interval', '1h')
+    }
+
+    if filters['interval'] not in TableStockService.INTERVALS:
+        raise ValueError(f'Неизвестный интервал {filters["interval"]}')
+
+    return filters
+
+
+def next_cursor(data, filters):
+    # Страница заполнена целиком - возможно, есть следующая
+    if filters['limit'] and data and len(data) == filters['limit']:
+        return data[-1].date
+    return None
+
+
 @api.route('/table_stock/<int:name_id>/<int:record_id>')
 @api.param('name_id', 'Айди названия компании')
 @api.param('record_id', 'Айди строчки биржы')
@@ -79,17 +145,27 @@ class TableStock(Resource):
                 'message': f'Ошибка при удалении биржы: {str(e)}'
             }, 500
 
-    @api.doc('get_all_table_stock')
+    @api.doc('get_all_table_stock', params=candle_filter_params)
     @api.response(200, 'Биржа успешно получена')
+    @api.response(400, 'Неверные параметры запроса')
     @api.response(404, 'Биржа не найдена')
     def get(self, name_id):
         try:
-            data = TableStockService.GetAll(name_id)
+            try:
+                filters = parse_candle_filters()
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
+            data = TableStockService.GetAll(name_id, **filters)
 
             if data:
                 return {
                     'success': True,
-                    'data': [record.to_dict() for record in data]
+                    'data': [record.to_dict() for record in data],
+                    'next_cursor': next_cursor(data, filters)
                 }, 200
 
             return {
@@ -104,6 +180,94 @@ class TableStock(Resource):
             }, 500
 
 
+EXPORT_FIELDS = ['name_id', 'date', 'open', 'high', 'low', 'close', 'volume']
+
+
+def export_ndjson(rows):
+    for name_id, record in rows:
+        yield json.dumps({'name_id': name_id, **record.to_dict()}) + '\n'
+
+
+def export_csv(rows, chunk_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for i, (name_id, record) in enumerate(rows, 1):
+        writer.writerow([name_id, record.date, record.open, record.high, record.low, record.close, record.volume])
+
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv')
+}
+
+
+@api.route('/table_stock/export')
+class ExportTableStock(Resource):
+
+    @api.doc('export_table_stock', params={
+        'name_ids': 'Айди названий компаний через запятую',
+        'format': 'Формат выгрузки: ndjson (по умолчанию) или csv',
+        'from': candle_filter_params['from'],
+        'to': candle_filter_params['to'],
+        'interval': candle_filter_params['interval']
+    })
+    @api.response(200, 'Выгрузка биржы начата')
+    @api.response(400, 'Неверные параметры запроса')
+    @api.response(503, 'База данных недоступна')
+    def get(self):
+        try:
+            filters = parse_candle_filters()
+            name_ids = [int(name_id) for name_id in request.args.get('name_ids', '').split(',') if name_id]
+            export_format = request.args.get('format', 'ndjson')
+
+            if not name_ids:
+                raise ValueError('Не указаны name_ids')
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError(f'Неизвестный формат {export_format}')
+
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': f'Ошибка при выгрузке биржы: {str(e)}'
+            }, 400
+
+        serializer, mimetype = EXPORT_FORMATS[export_format]
+
+        # Подключение и первый запрос - до заголовков ответа, чтобы сбой БД вернулся кодом ошибки
+        connection = db_connection()
+        if not connection:
+            return {
+                'success': False,
+                'message': 'База данных недоступна'
+            }, 503
+
+        try:
+            rows = TableStockService.Stream(connection, name_ids, begin_date=filters['begin_date'],
+                                            end_date=filters['end_date'], interval=filters['interval'])
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Ошибка при выгрузке биржы: {str(e)}'
+            }, 500
+
+        response = Response(stream_with_context(serializer(rows)), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=table_stock.{export_format}'
+        })
+        # Оборванная выгрузка: закрытие ответа закрывает генератор строк, а он - соединение
+        response.call_on_close(rows.close)
+
+        return response
+
+
 @api.route('/table_stock')
 class CreateTableStock(Resource):
 
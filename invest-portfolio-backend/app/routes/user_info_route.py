@@ -1,6 +1,7 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.services.user_info_service import UserService
+from app.routes.table_stock_route import parse_date_arg, parse_int_arg
 
 api = Namespace('dti', description='Операции с портфелем')
 
@@ -127,11 +128,31 @@ class UserInfo(Resource):
                 'message': f'Ошибка при создании портфеля: {str(e)}'
             }, 500
 
-    @api.doc('get_all_user_info')
+    @api.doc('get_all_user_info', params={
+        'from': 'Начало периода',
+        'to': 'Конец периода',
+        'limit': 'Количество портфелей на странице',
+        'offset': 'Смещение от начала истории'
+    })
     @api.response(200, 'Данные портфелей успешно получены')
+    @api.response(400, 'Неверные параметры запроса')
     def get(self):
         try:
-            data = UserService.GetAll()
+            # Параметры периода и страницы - те же, что у /table_stock
+            try:
+                filters = {
+                    'begin_date': parse_date_arg('from'),
+                    'end_date': parse_date_arg('to'),
+                    'limit': parse_int_arg('limit', minimum=1),
+                    'offset': parse_int_arg('offset') or 0
+                }
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
+            data = UserService.GetAll(**filters)
 
             if data:
                 return {
@@ -1,21 +1,29 @@
-import os
 import pandas as pd
 import numpy as np
 
 from datetime import datetime, timedelta
 
+from app.config import Config
 from app.models.predict_model import PredictModel, TablePredicts
-from typing import List
+from typing import List, Dict
 
 from database.db_connection import db_connection, close_connection
 
-from app.ml_models.src.model.ml_model import MlModelStock, MlModelTrend
 from app.ml_models.src.data_processing.data_processing import DataProcessing
+from app.ml_models.src.data_processing.indicator_engine import IndicatorEngine
 from app.ml_models.src.data_processing.data_processing_trend import DataProcessingTrend
-from app.ml_models.src.model import train_model_stock, train_model_trend
+from app.ml_models.src.model.model_registry import model_registry
+from app.ml_models.src.model.export_model import TFLiteModel, tflite_path, tflite_available
+from app.ml_models.src.data_processing.feature_pipeline import load_scalers
+from app.services.ml_train_service import MlTrainService, TREND_MODEL_PATH, STOCK_MODEL_PATH
+from app.utils.prediction_cache import prediction_cache
 
-from app.utils.prepare_template_predict import (calc_market_signal, calc_assurance_trend, calc_volatility,
-                                                calc_balance_models, calc_recommendation_signal)
+from app.utils.prepare_template_predict import (calc_scores, class_market_signal, class_balance_models,
+                                                class_volatility, class_recommendation_signal)
+
+
+# Окно тренд-модели начинается с этой свечи окна сток-модели (последние 45 свечей)
+TREND_OFFSET = 29
 
 
 def serialize_date(obj):
@@ -27,46 +35,191 @@ def serialize_date(obj):
 class MlPredictService:
 
     @classmethod
-    def predict(self, hours, ticker):
-        path_trend = f'app/ml_models/models/trend_train_models/ml_{ticker}_trend_model.keras'
-        path_stock = f'app/ml_models/models/stock_train_models/ml_stock_{ticker}_model.keras'
+    def GetPredict(cls, hours, ticker) -> PredictModel:
+        job = MlTrainService.EnsureModels(ticker)
+        if job is not None:
+            MlTrainService.Wait(job)
+
+        def compute():
+            table_predict, trend_predict = cls.predict(hours, ticker)
+            return cls.template_predict(table_predict, trend_predict, hours)
+
+        return prediction_cache.get(cls._cache_key(hours, ticker), compute)
+
+    @classmethod
+    def GetPredictBatch(cls, tickers, horizons) -> Dict[str, Dict[int, PredictModel]]:
+        # Прогнозы списка тикеров на несколько горизонтов. Модели тикеров должны быть уже обучены.
+        # Окна всех тикеров читаются одним запросом, на тикер - один прогноз на самый длинный
+        # из недостающих горизонтов (короткие - его начало), оценки - один проход на горизонт
+        windows = cls._load_windows(tickers)
+
+        result = {}
+        keys = {}
+        missing = {}  # часы -> [(тикер, таблица прогноза, прогноз тренда)]
+
+        for ticker, (last_date, window) in windows.items():
+            version = cls._model_version(ticker)
+            result[ticker] = {}
+
+            todo = []
+            for hours in horizons:
+                keys[ticker, hours] = (ticker, hours, last_date, version)
+                value = prediction_cache.lookup(keys[ticker, hours])
+
+                if value is None:
+                    todo.append(hours)
+                else:
+                    result[ticker][hours] = value
+
+            if not todo:
+                continue
+
+            try:
+                table_predict, trend_predict = cls.forecast(ticker, window, last_date, max(todo))
+            except Exception as e:
+                print(f'Сервис ml_predict. Ошибка в прогнозе {ticker}: {e}')
+                continue
 
-        if not os.path.exists(path_trend):
-            self._train_model_trend(ticker)
+            for hours in todo:
+                missing.setdefault(hours, []).append((ticker, table_predict[:hours], trend_predict[:hours]))
 
-        if not os.path.exists(path_stock):
-            self._train_model_stock(ticker)
+        for hours, items in missing.items():
+            models = cls.template_predict_batch([i[1] for i in items], [i[2] for i in items], hours)
+
+            for (ticker, _, _), model in zip(items, models):
+                prediction_cache.put(keys[ticker, hours], model)
+                result[ticker][hours] = model
+
+        return result
+
+    @classmethod
+    def Precompute(cls, tickers, horizons) -> int:
+        # Прогревает кэш прогнозов, чтобы запросы по типовым горизонтам не ждали инференса.
+        # Тикеры без обученных моделей пропускаются: обучение здесь не запускается
+        ready = []
+        for ticker in tickers:
+            if not MlTrainService.models_exist(ticker) or MlTrainService.EnsureModels(ticker) is not None:
+                print(f'Сервис ml_predict. Нет готовых моделей для {ticker}, предрасчет пропущен')
+                continue
+            ready.append(ticker)
+
+        if not ready:
+            return 0
+
+        result = cls.GetPredictBatch(ready, horizons)
+        return sum(len(predictions) for predictions in result.values())
+
+    @classmethod
+    def _model_version(cls, ticker):
+        path_trend = TREND_MODEL_PATH.format(ticker=ticker)
+        path_stock = STOCK_MODEL_PATH.format(ticker=ticker)
+
+        # Версия по файлам, которые реально обслуживают прогноз: повторный экспорт .tflite или смена
+        # INFERENCE_BACKEND / INFERENCE_QUANTIZATION дают новый ключ кэша
+        paths = (cls._model_file(path_trend, 'trend'), cls._model_file(path_stock, 'stock'),
+                 path_stock.replace('.keras', '_scalers.pkl'))
+        return paths, model_registry.version(paths)
+
+    @classmethod
+    def _cache_key(cls, hours, ticker):
+        # Прогноз меняется только с новой свечой или новой моделью - их и берем в ключ кэша
+        return ticker, hours, cls._last_candle_ts(ticker), cls._model_version(ticker)
+
+    @classmethod
+    def _last_candle_ts(cls, ticker):
+        connection = db_connection()
+        try:
+            cursor = connection.cursor()
+
+            queue = """SELECT MAX(c.ts)
+                            FROM candles as c
+                            JOIN stock_names as st ON c.ticker_id = st.name_id
+                            WHERE st.name = %s"""
+            cursor.execute(queue, (ticker,))
+
+            return cursor.fetchall()[0][0]
+        finally:
+            close_connection(connection)
+
+    @classmethod
+    def _load_windows(cls, tickers):
+        # Последние 45 свечей каждого тикера одним запросом: {тикер: (время последней свечи, окно)}.
+        # Порядок строк окна - как в predict, от новой свечи к старой
+        connection = db_connection()
+        try:
+            cursor = connection.cursor()
+
+            queue = f"""SELECT name, ts, open, high, low, close
+                            FROM (
+                                SELECT st.name, c.ts, c.open, c.high, c.low, c.close,
+                                       ROW_NUMBER() OVER (PARTITION BY c.ticker_id ORDER BY c.ts DESC) as rn
+                                FROM candles as c
+                                JOIN stock_names as st ON c.ticker_id = st.name_id
+                                WHERE st.name IN ({', '.join(['%s'] * len(tickers))}) AND c.ts >= '2025-10-01'
+                            ) as w
+                            WHERE rn <= 45
+                            ORDER BY name, rn"""
+            cursor.execute(queue, tuple(tickers))
+
+            rows = {}
+            for name, ts, *candle in cursor.fetchall():
+                rows.setdefault(name.lower(), []).append((ts, candle))
+        finally:
+            close_connection(connection)
+
+        return {name: (data[0][0], np.array([candle for _, candle in data], dtype=float))
+                for name, data in rows.items()}
+
+    @classmethod
+    def predict(self, hours, ticker):
+        # Маршрут отвечает 202, пока модели обучаются; прямой вызов дожидается обучения
+        job = MlTrainService.EnsureModels(ticker)
+        if job is not None:
+            MlTrainService.Wait(job)
 
         connection = db_connection()
         cursor = connection.cursor()
 
-        queue = f"""SELECT date FROM {ticker} ORDER BY date DESC LIMIT 1;"""
-        cursor.execute(queue)
+        queue = """SELECT name_id FROM stock_names WHERE name = %s"""
+        cursor.execute(queue, (ticker,))
+        ticker_id = cursor.fetchall()[0][0]
+
+        queue = """SELECT ts FROM candles WHERE ticker_id = %s ORDER BY ts DESC LIMIT 1;"""
+        cursor.execute(queue, (ticker_id,))
         last_date = cursor.fetchall()[0][0]
 
-        queue = f"""SELECT open, high, low, close
-                            FROM {ticker}
-                            WHERE date >= '2025-10-01'
-                            ORDER BY date DESC
+        queue = """SELECT open, high, low, close
+                            FROM candles
+                            WHERE ticker_id = %s AND ts >= '2025-10-01'
+                            ORDER BY ts DESC
                             LIMIT 45"""
-        cursor.execute(queue)
+        cursor.execute(queue, (ticker_id,))
 
         data = cursor.fetchall()
 
         close_connection(connection)
 
-        df = pd.DataFrame(data, columns=['open', 'high', 'low', 'close'])
+        return self.forecast(ticker, np.array(data, dtype=float), last_date, hours)
+
+    @classmethod
+    def forecast(cls, ticker, window: np.ndarray, last_date, hours):
+        # Окно фиксированного размера: каждый шаг прогноза сдвигает его на одну свечу
+        window = window.copy()
+
+        # Признаки сток-модели обновляются на каждую спрогнозированную свечу, а не считаются по окну заново
+        engine = IndicatorEngine()
+        for candle in window:
+            engine.update(*candle)
 
-        model_trend = train_model_trend.TrainModel().load_model(path=path_trend)
-        model_stock, scalers = train_model_stock.TrainModel().load_model(path=path_stock)
+        model_trend, model_stock, scalers = cls._load_models(ticker)
 
         table_predict = []
         list_trend_predict = []
 
         for i in range(hours):
 
-            trend_res, trend_predict = self._predict_trend(model_trend, df[i + 29:])
-            stock_predict = self._predict_stock(model_stock, scalers, df[i:], trend_res)
+            trend_res, trend_predict = cls._predict_trend(model_trend, window[TREND_OFFSET:TREND_OFFSET + 14])
+            stock_predict = cls._predict_stock(model_stock, scalers, engine.features(), window[-1], trend_res)
 
             pred = []
             pred.append(last_date + timedelta(hours=1))
@@ -76,55 +229,113 @@ class MlPredictService:
             table_predict.append(pred)
             list_trend_predict.append(trend_predict)
 
-            print(stock_predict)
-            print(list(stock_predict.values()))
-
-            df_row = pd.DataFrame([stock_predict])
-            df = pd.concat([df, df_row], ignore_index=True)
+            window[:-1] = window[1:]
+            window[-1] = [stock_predict[key] for key in ['open', 'high', 'low', 'close']]
+            engine.update(*window[-1])
 
         return table_predict, list_trend_predict
 
     @classmethod
-    def template_predict(cls, table_predict, trend_predict, hours) -> PredictModel:
-
-        # Создаем шаблон
-        market_signal, score_market_signal = calc_market_signal(trend_predict, table_predict)
-        assurance = calc_assurance_trend(score_market_signal, trend_predict)
-        balance_signal, score_balance_signal = calc_balance_models(trend_predict, table_predict)
-        volatility_signal, volatility = calc_volatility(table_predict)
-        recommendation_signal = calc_recommendation_signal(table_predict, volatility,
-                                                           score_balance_signal, score_market_signal)
-
-        model = PredictModel(
-            hours=hours,
-            market_signal=market_signal,
-            assurance=float(assurance),
-            balance=balance_signal,
-            volatility=volatility_signal,
-            recommendation_signal=recommendation_signal,
-            table_predict=[TablePredicts(
-                date=serialize_date(row[0]),
-                open=float(row[1]),
-                high=float(row[2]),
-                low=float(row[3]),
-                close=float(row[4]),
-            ) for row in table_predict]
+    def _load_models(cls, ticker):
+        path_trend = TREND_MODEL_PATH.format(ticker=ticker)
+        path_stock = STOCK_MODEL_PATH.format(ticker=ticker)
+        path_scalers = path_stock.replace('.keras', '_scalers.pkl')
+
+        model_path_trend, model_path_stock = cls._model_file(path_trend, 'trend'), cls._model_file(path_stock, 'stock')
+
+        # Модули Keras импортируются только для бэкенда keras: прогноз по .tflite обходится без TensorFlow
+        def load_trend():
+            if model_path_trend.endswith('.tflite'):
+                return TFLiteModel(model_path_trend)
+            from app.ml_models.src.model import train_model_trend
+            return cls._serving_function(train_model_trend.TrainModel().load_model(path=path_trend))
+
+        def load_stock():
+            if model_path_stock.endswith('.tflite'):
+                return TFLiteModel(model_path_stock), load_scalers(path_scalers)
+            from app.ml_models.src.model import train_model_stock
+            model, scalers = train_model_stock.TrainModel().load_model(path=path_stock)
+            return cls._serving_function(model), scalers
+
+        # Файл модели входит в ключ: смена бэкенда или квантования загружает другую модель
+        model_trend = model_registry.get(('trend', ticker, model_path_trend), [model_path_trend], load_trend)
+        model_stock, scalers = model_registry.get(
+            ('stock', ticker, model_path_stock), [model_path_stock, path_scalers], load_stock
         )
+
+        return model_trend, model_stock, scalers
+
+    @classmethod
+    def _model_file(cls, path, kind):
+        # auto - облегченная модель, если ее экспорт свежее .keras, иначе Keras.
+        # Квантованная копия из INFERENCE_QUANTIZATION берется, только если она тоже свежая
+        if Config.INFERENCE_BACKEND == 'keras' or \
+                (Config.INFERENCE_BACKEND == 'auto' and not tflite_available(path)):
+            return path
+
+        quantization = Config.INFERENCE_QUANTIZATION.get(kind)
+        if quantization and tflite_available(path, quantization):
+            return tflite_path(path, quantization)
+        return tflite_path(path)
+
+    @classmethod
+    def _serving_function(cls, model):
+        # Прямой вызов модели, скомпилированный в граф один раз при загрузке:
+        # без накладных расходов model.predict и без пошагового eager-выполнения LSTM
+        import tensorflow as tf
+
+        @tf.function(input_signature=[tf.TensorSpec(model.input_shape, tf.float32)])
+        def serve(x):
+            return model(x, training=False)
+
+        return serve
+
+    @classmethod
+    def template_predict(cls, table_predict, trend_predict, hours) -> PredictModel:
+        model = cls.template_predict_batch([table_predict], [trend_predict], hours)[0]
         print(model.to_dict())
 
         return model
 
     @classmethod
-    def _predict_trend(self, model, df: pd.DataFrame):
-        try:
-            df = df.copy()
-
-            df['close'] = pd.to_numeric(df['close'], errors='coerce')
-            df['open'] = pd.to_numeric(df['open'], errors='coerce')
+    def template_predict_batch(cls, tables_predict, trends_predict, hours) -> List[PredictModel]:
+        # Создаем шаблоны: оценки всех прогнозов одного горизонта считаются одним проходом,
+        # тексты - по готовым оценкам
+        scores = calc_scores([[row[1:] for row in table] for table in tables_predict], trends_predict)
+
+        models = []
+        for i, table_predict in enumerate(tables_predict):
+            market_signal, _ = class_market_signal(scores['market'][i])
+            balance_signal, _ = class_balance_models(scores['balance'][i])
+            volatility_signal, _ = class_volatility(scores['volatility'][i])
+            recommendation_signal = class_recommendation_signal(scores['recommendation'][i])
+
+            models.append(PredictModel(
+                hours=hours,
+                market_signal=market_signal,
+                assurance=float(scores['assurance'][i]),
+                balance=balance_signal,
+                volatility=volatility_signal,
+                recommendation_signal=recommendation_signal,
+                table_predict=[TablePredicts(
+                    date=serialize_date(row[0]),
+                    open=float(row[1]),
+                    high=float(row[2]),
+                    low=float(row[3]),
+                    close=float(row[4]),
+                ) for row in table_predict]
+            ))
+
+        return models
 
-            x_data = DataProcessingTrend().prepare_data(df, 14, 100)
+    @classmethod
+    def _predict_trend(self, model, window: np.ndarray):
+        # Тренд-модели нужна одна матрица по 14 свечам окна, а не все матрицы подряд
+        try:
+            x_data = DataProcessingTrend().prepare_data(
+                pd.DataFrame({'open': window[:, 0], 'close': window[:, 3]}), 14, 100)
 
-            pred = model.predict(x_data)
+            pred = np.asarray(model(x_data[..., np.newaxis].astype(np.float32)))
 
             up, flat, down = pred[0]
             mx = max(pred[0])
@@ -144,32 +355,22 @@ class MlPredictService:
             return None
 
     @classmethod
-    def _predict_stock(self, model, scalers, df: pd.DataFrame, trend_res):
+    def _predict_stock(self, model, scalers, features: np.ndarray, last_candle: np.ndarray, trend_res):
         try:
-            df = df.copy()
-
-            x_data = DataProcessing().prepare_data(df)
-            x_data.loc[x_data.index[-1], 'trend'] = trend_res
-            x_data = x_data.values
+            x_data = features.copy()
+            x_data[-1, DataProcessing.FEATURES.index('trend')] = trend_res
 
-            x_seq = []
-            x_seq.append(x_data)
-            x_data = np.array(x_seq)
+            # Параметры стандартизации - из обучения, окно только преобразуется
+            x_data = scalers['feature'].transform(x_data)[np.newaxis]
 
-            x_data_reshape = x_data.reshape(-1, x_data.shape[-1])
-            x_data_scaled = scalers['feature'].fit_transform(x_data_reshape)
-            x_data = x_data_scaled.reshape(x_data.shape)
+            predict = model(x_data.astype(np.float32))
 
-            predict = model.predict(x_data)
+            scaled = np.array([np.asarray(predict[key])[0, 0] for key in ['open', 'high', 'low', 'close']])
+            unscaled = scalers['target'].inverse_transform(scaled)
 
             list_predict = {}
-
-            temp_array = np.zeros((1, 4))
             for j, key in enumerate(['open', 'high', 'low', 'close']):
-                temp_array[0, j] = predict[key][0]
-                unscaled = scalers['target'].inverse_transform(temp_array)
-                list_predict[key] = np.exp(unscaled[0, j]) * float(df.loc[df.index[-1], key])
-                temp_array[0, j] = 0
+                list_predict[key] = np.exp(unscaled[j]) * float(last_candle[j])
 
             return list_predict
 
@@ -177,75 +378,3 @@ class MlPredictService:
 
             print(f'Сервис ml_predict. Ошибка в предсказании сток модели: {e}')
             return False
-
-
-    @classmethod
-    def _train_model_trend(self, ticker):
-        try:
-            connection = db_connection()
-            cursor = connection.cursor()
-
-            queue = f"""SELECT close, open
-                            FROM {ticker}
-                            WHERE date >= '2024-01-01'
-                            ORDER BY date"""
-            cursor.execute(queue)
-
-            data = cursor.fetchall()
-
-            close_connection(connection)
-
-            df = pd.DataFrame(data, columns=['close', 'open'])
-            df['close'] = pd.to_numeric(df['close'], errors='coerce')
-            df['open'] = pd.to_numeric(df['open'], errors='coerce')
-
-            model = MlModelTrend().create_model(14, 100)
-
-            train_model = train_model_trend.TrainModel()
-
-            train, val, test = train_model.prepare_data(df)
-
-            history = train_model.train_model(train, val, model, 1000)
-
-            train_model.save_model(model, path=f'app/ml_models/models/trend_train_models/ml_{ticker}_trend_model.keras')
-
-            return True
-
-        except Exception as e:
-
-            print(f'Сервис ml_predict. Ошибка в обучении тренд модели: {e}')
-            return False
-
-    @classmethod
-    def _train_model_stock(self, ticker):
-        try:
-            connection = db_connection()
-            cursor = connection.cursor()
-
-            queue = f"""SELECT open, high, low, close
-                                    FROM {ticker}
-                                    WHERE date >= '2025-01-01'
-                                    ORDER BY date"""
-            cursor.execute(queue)
-
-            data = cursor.fetchall()
-
-            close_connection(connection)
-
-            df = pd.DataFrame(data, columns=['open', 'high', 'low', 'close'])
-
-            model = MlModelStock().create_model(8, 24)
-
-            train_model = train_model_stock.TrainModel()
-
-            train, val, test, size = train_model.prepare_data(df)
-
-            history = train_model.train_model(train, val, model, 100)
-
-            train_model.save_model(model, path=f'app/ml_models/models/stock_train_models/ml_stock_{ticker}_model.keras')
-
-            return True
-
-        except Exception as e:
-            print(f'Сервис ml_predict. Ошибка в обучении сток модели: {e}')
-            return False
@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.models.ml_train_model import TrainJobModel
+from app.utils.prediction_cache import prediction_cache
+
+from database.db_connection import db_connection, close_connection
+
+from app.ml_models.src.model.export_model import calibration_sample, quantization_report
+
+
+# Keras, TensorFlow и scikit-learn импортируются при первом обучении, а не при старте API
+
+TREND_MODEL_PATH = 'app/ml_models/models/trend_train_models/ml_{ticker}_trend_model.keras'
+STOCK_MODEL_PATH = 'app/ml_models/models/stock_train_models/ml_stock_{ticker}_model.keras'
+# У каждой пары (модель, тикер) свой чекпоинт, чтобы параллельные обучения не перезаписывали чужой
+CHECKPOINT_PATH = 'models/checkpoint/{stage}_{ticker}_best_model.keras'
+
+TREND_EPOCHS = 1000
+STOCK_EPOCHS = 100
+
+
+class MlTrainService:
+
+    _executor = ThreadPoolExecutor(max_workers=Config.TRAIN_WORKERS, thread_name_prefix='ml_train')
+    _jobs = {}
+    _active = {}  # тикер -> id активной задачи
+    _lock = threading.Lock()
+
+    @classmethod
+    def models_exist(cls, ticker) -> bool:
+        return (os.path.exists(TREND_MODEL_PATH.format(ticker=ticker)) and
+                os.path.exists(STOCK_MODEL_PATH.format(ticker=ticker)))
+
+    @classmethod
+    def Submit(cls, ticker, force=False) -> TrainJobModel:
+        # Повторный запрос по тикеру, который уже обучается, получает ту же задачу
+        with cls._lock:
+            job_id = cls._active.get(ticker)
+            if job_id is not None:
+                return cls._jobs[job_id]
+
+            job = TrainJobModel(id=uuid.uuid4().hex, ticker=ticker, status='queued',
+                                created_at=datetime.now().isoformat())
+            cls._jobs[job.id] = job
+            cls._active[ticker] = job.id
+            cls._forget_finished()
+
+        cls._executor.submit(cls._run, job, force)
+        return job
+
+    @classmethod
+    def EnsureModels(cls, ticker):
+        # None - модели готовы, иначе задача, которая их обучает
+        with cls._lock:
+            job_id = cls._active.get(ticker)
+            if job_id is not None:
+                return cls._jobs[job_id]
+
+        if cls.models_exist(ticker):
+            return None
+
+        return cls.Submit(ticker)
+
+    @classmethod
+    def GetJob(cls, job_id) -> TrainJobModel:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def Wait(cls, job, poll=1.0) -> TrainJobModel:
+        while job.active:
+            time.sleep(poll)
+        return job
+
+    @classmethod
+    def _forget_finished(cls):
+        finished = [job_id for job_id, job in cls._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - Config.TRAIN_JOBS_HISTORY)]:
+            del cls._jobs[job_id]
+
+    @classmethod
+    def _run(cls, job, force):
+        job.status = 'running'
+        job.started_at = datetime.now().isoformat()
+        status = 'failed'
+
+        try:
+            from app.ml_models.src.model.train_progress import TrainJobProgress
+
+            check = True
+
+            if force or not os.path.exists(TREND_MODEL_PATH.format(ticker=job.ticker)):
+                check = cls.train_trend(job.ticker, [TrainJobProgress(job, 'trend', TREND_EPOCHS)])
+
+            if check and (force or not os.path.exists(STOCK_MODEL_PATH.format(ticker=job.ticker))):
+                check = cls.train_stock(job.ticker, [TrainJobProgress(job, 'stock', STOCK_EPOCHS)])
+
+            if check:
+                status = 'done'
+            else:
+                job.error = 'Обучение модели завершилось с ошибкой'
+
+        except Exception as e:
+            job.error = str(e)
+
+        finally:
+            job.eta_seconds = None
+            job.finished_at = datetime.now().isoformat()
+            with cls._lock:
+                job.status = status
+                cls._active.pop(job.ticker, None)
+
+    @classmethod
+    def val_metrics(cls, history) -> dict:
+        # Валидационные метрики эпохи с лучшим val_loss - ее веса восстанавливает EarlyStopping
+        logs = history.history
+        best = int(np.argmin(logs['val_loss']))
+
+        metrics = {key: float(values[best]) for key, values in logs.items() if key.startswith('val_')}
+        metrics['epochs'] = len(logs['val_loss'])
+        metrics['best_epoch'] = best + 1
+
+        return metrics
+
+    @classmethod
+    def quantization_metrics(cls, path, test):
+        # Отчет о потерях квантования на тестовой выборке, только если квантованные копии включены
+        if not Config.EXPORT_QUANTIZATION:
+            return None
+
+        try:
+            return quantization_report(path, *test)
+        except Exception as e:
+            print(f'Сервис ml_train. Ошибка в отчете о квантовании {path}: {e}')
+            return None
+
+    @classmethod
+    def train_trend(cls, ticker, callbacks=None):
+        try:
+            from app.ml_models.src.model.ml_model import MlModelTrend
+            from app.ml_models.src.model import train_model_trend
+
+            connection = db_connection()
+            cursor = connection.cursor()
+
+            queue = """SELECT c.ts, c.close, c.open
+                            FROM candles as c
+                            JOIN stock_names as st ON c.ticker_id = st.name_id
+                            WHERE st.name = %s AND c.ts >= '2024-01-01'
+                            ORDER BY c.ts"""
+            cursor.execute(queue, (ticker,))
+
+            data = cursor.fetchall()
+
+            close_connection(connection)
+
+            df = pd.DataFrame(data, columns=['ts', 'close', 'open'])
+            df['close'] = pd.to_numeric(df['close'], errors='coerce')
+            df['open'] = pd.to_numeric(df['open'], errors='coerce')
+
+            model = MlModelTrend().create_model(14, 100)
+
+            train_model = train_model_trend.TrainModel()
+
+            train, val, test = train_model.prepare_data(df, ticker=ticker)
+
+            history = train_model.train_model(train, val, model, TREND_EPOCHS, extra_callbacks=callbacks,
+                                              checkpoint_path=CHECKPOINT_PATH.format(stage='trend', ticker=ticker))
+
+            train_model.save_model(model, path=TREND_MODEL_PATH.format(ticker=ticker),
+                                   calibration=calibration_sample(train[0]))
+            prediction_cache.invalidate(ticker)
+
+            metrics = cls.val_metrics(history)
+            metrics['quantization'] = cls.quantization_metrics(TREND_MODEL_PATH.format(ticker=ticker), test)
+
+            return metrics
+
+        except Exception as e:
+
+            print(f'Сервис ml_train. Ошибка в обучении тренд модели: {e}')
+            return False
+
+    @classmethod
+    def train_stock(cls, ticker, callbacks=None):
+        try:
+            from app.ml_models.src.model.ml_model import MlModelStock
+            from app.ml_models.src.model import train_model_stock
+
+            connection = db_connection()
+            cursor = connection.cursor()
+
+            queue = """SELECT c.open, c.high, c.low, c.close
+                                    FROM candles as c
+                                    JOIN stock_names as st ON c.ticker_id = st.name_id
+                                    WHERE st.name = %s AND c.ts >= '2025-01-01'
+                                    ORDER BY c.ts"""
+            cursor.execute(queue, (ticker,))
+
+            data = cursor.fetchall()
+
+            close_connection(connection)
+
+            df = pd.DataFrame(data, columns=['open', 'high', 'low', 'close'])
+
+            model = MlModelStock().create_model(8, 24)
+
+            train_model = train_model_stock.TrainModel()
+
+            train, val, test, size = train_model.prepare_data(df)
+
+            history = train_model.train_model(train, val, model, STOCK_EPOCHS, extra_callbacks=callbacks,
+                                              checkpoint_path=CHECKPOINT_PATH.format(stage='stock', ticker=ticker))
+
+            train_model.save_model(model, path=STOCK_MODEL_PATH.format(ticker=ticker),
+                                   calibration=calibration_sample(train[0]))
+            prediction_cache.invalidate(ticker)
+
+            metrics = cls.val_metrics(history)
+            metrics['quantization'] = cls.quantization_metrics(STOCK_MODEL_PATH.format(ticker=ticker), test)
+
+            return metrics
+
+        except Exception as e:
+            print(f'Сервис ml_train. Ошибка в обучении сток модели: {e}')
+            return False
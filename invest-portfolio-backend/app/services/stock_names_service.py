@@ -7,7 +7,7 @@ from database.db_connection import db_connection, close_connection
 class StockNamesService:
 
     @classmethod
-    def GetOneById(cls, name_id) -> StockNameModel:
+    def GetOneById(cls, name_id, **table_filters) -> StockNameModel:
         try:
             connection = db_connection()
             cursor = connection.cursor()
@@ -18,7 +18,7 @@ class StockNamesService:
 
             close_connection(connection)
 
-            list_table_stock = TableStockService.GetAll(name_id)
+            list_table_stock = TableStockService.GetAll(name_id, **table_filters)
 
             return StockNameModel(
                 id=data[0][0],
@@ -31,6 +31,25 @@ class StockNamesService:
             print(f'Ошибка в сервисе: {e}')
             return None
 
+    @classmethod
+    def GetName(cls, name_id) -> str:
+        # Только название актива, без свечей - для прогноза и обучения
+        try:
+            connection = db_connection()
+            cursor = connection.cursor()
+
+            queue = """SELECT name FROM stock_names WHERE name_id = %s"""
+            cursor.execute(queue, (name_id,))
+            data = cursor.fetchall()
+
+            close_connection(connection)
+
+            return data[0][0] if data else None
+
+        except Exception as e:
+            print(f'Ошибка в сервисе: {e}')
+            return None
+
     @classmethod
     def GetAllNames(cls) -> List[StockNamesModel]:
         try:
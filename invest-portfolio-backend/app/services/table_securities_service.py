@@ -1,5 +1,5 @@
 from database.db_connection import db_connection, close_connection
-from typing import List
+from typing import List, Dict
 from app.models.user_info_model import TableSecuritiesModel
 
 
@@ -14,39 +14,87 @@ class TableSecuritiesService:
         cursor.execute(queue, (user_id,))
         date = cursor.fetchall()[0][0]
 
-        queue = f"""SELECT close FROM {ticker} WHERE date < %s
-                    ORDER BY date DESC LIMIT 1"""
-        cursor.execute(queue, (date,))
+        queue = """SELECT c.close FROM candles as c
+                    JOIN stock_names as st ON c.ticker_id = st.name_id
+                    WHERE st.name = %s AND c.ts < %s
+                    ORDER BY c.ts DESC LIMIT 1"""
+        cursor.execute(queue, (ticker, date))
         close = cursor.fetchall()[0][0]
 
         close_connection(connection)
 
+        return self.calc_change(price, close)
+
+    @classmethod
+    def get_reference_closes(cls, cursor, tickers, user_ids) -> dict:
+        # Последние цены закрытия до даты каждого портфеля по всем тикерам одним запросом.
+        # Подзапрос - поиск по первичному ключу (ticker_id, ts) таблицы candles
+        tickers = list(dict.fromkeys(tickers))
+        user_ids = list(dict.fromkeys(user_ids))
+        if not tickers or not user_ids:
+            return {}
+
+        ticker_placeholders = ', '.join(['%s'] * len(tickers))
+        user_placeholders = ', '.join(['%s'] * len(user_ids))
+        queue = f"""SELECT ui.id, st.name,
+                    (SELECT c.close FROM candles as c
+                    WHERE c.ticker_id = st.name_id AND c.ts < ui.date
+                    ORDER BY c.ts DESC LIMIT 1)
+                    FROM user_info as ui
+                    CROSS JOIN stock_names as st
+                    WHERE ui.id IN ({user_placeholders}) AND st.name IN ({ticker_placeholders})"""
+
+        cursor.execute(queue, user_ids + tickers)
+        return {(user_id, ticker): close for user_id, ticker, close in cursor.fetchall()}
+
+    @classmethod
+    def calc_change(cls, price, close):
         return (1 - float(price / float(close))) * 100, (float(price) - float(close))
 
+    @classmethod
+    def get_all_by_users(cls, cursor, user_ids) -> Dict[int, List[TableSecuritiesModel]]:
+        # Активы нескольких портфелей: один запрос за активами и один за ценами закрытия
+        result = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return result
+
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        queue = f"""SELECT
+                tb.user_id,
+                st.name,
+                tb.quantity,
+                tb.price
+                FROM table_securities as tb
+                JOIN stock_names as st ON tb.securitie_id = st.name_id
+                WHERE tb.user_id IN ({placeholders})
+                ORDER BY tb.user_id, tb.id"""
+        cursor.execute(queue, list(user_ids))
+        data = cursor.fetchall()
+
+        closes = cls.get_reference_closes(cursor, [row[1] for row in data], [row[0] for row in data])
+
+        for user_id, ticker, quantity, price in data:
+            percentage_change, price_change = cls.calc_change(float(price), closes[(user_id, ticker)])
+            result[user_id].append(TableSecuritiesModel(
+                ticker=ticker,
+                quantity=quantity,
+                price=float(price),
+                percentage_change=percentage_change,
+                price_change=price_change
+            ))
+
+        return result
+
     @classmethod
     def GetAll(self, user_id) -> List[TableSecuritiesModel]:
         try:
             connection = db_connection()
             cursor = connection.cursor()
 
-            queue = """SELECT
-                    st.name,
-                    tb.quantity,
-                    tb.price
-                    FROM table_securities as tb
-                    JOIN stock_names as st ON tb.securitie_id = st.name_id 
-                    WHERE tb.user_id = %s"""
-            cursor.execute(queue, [user_id])
-            data = cursor.fetchall()
+            result = self.get_all_by_users(cursor, [user_id])[user_id]
 
             close_connection(connection)
-            return [TableSecuritiesModel(
-                ticker=data[row][0],
-                quantity=data[row][1],
-                price=float(data[row][2]),
-                percentage_change=self.get_percentage_change(user_id, data[row][0], float(data[row][2]))[0],
-                price_change=self.get_percentage_change(user_id, data[row][0], float(data[row][2]))[1]
-            ) for row in range(len(data))]
+            return result
         except Exception as e:
             print(f'Ошибка в сервисе: {e}')
             return None
@@ -87,12 +135,8 @@ class TableSecuritiesService:
             cursor.execute(queue, (user_id,))
             date = cursor.fetchall()[0][0]
 
-            queue = """SELECT name FROM stock_names WHERE name_id = %s"""
-            cursor.execute(queue, (sequritie_id,))
-            name = cursor.fetchall()[0][0]
-
-            queue = f"""SELECT close FROM {name} WHERE date <= %s ORDER BY date DESC LIMIT 1"""
-            cursor.execute(queue, (date,))
+            queue = """SELECT close FROM candles WHERE ticker_id = %s AND ts <= %s ORDER BY ts DESC LIMIT 1"""
+            cursor.execute(queue, (sequritie_id, date))
             price = float(cursor.fetchall()[0][0])
 
             queue = f"""SELECT id, quantity FROM table_securities WHERE user_id = %s AND securitie_id = %s"""
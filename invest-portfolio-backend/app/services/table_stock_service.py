@@ -3,6 +3,7 @@ from database.db_connection import db_connection, close_connection
 from typing import List
 from app.utils.load_df import load_df
 from app.utils.update_df import update_df
+from app.utils.prediction_cache import prediction_cache
 
 
 class TableStockService:
@@ -13,19 +14,15 @@ class TableStockService:
             connection = db_connection()
             cursor = connection.cursor()
 
-            queue = """SELECT name FROM stock_names WHERE name_id = %s"""
-            cursor.execute(queue, (name_id,))
-            stock_name = cursor.fetchall()[0][0]
-
-            queue = f"""SELECT 
-                        date,
+            queue = """SELECT
+                        ts,
                         open,
                         high,
                         low,
                         close,
                         volume
-                        FROM {stock_name} WHERE id = %s"""
-            cursor.execute(queue, (id,))
+                        FROM candles WHERE ticker_id = %s AND id = %s"""
+            cursor.execute(queue, (name_id, id))
             data = cursor.fetchall()
 
             close_connection(connection)
@@ -41,26 +38,89 @@ class TableStockService:
             print(f'Ошибка в сервисе: {e}')
             return None
 
-    @classmethod
-    def GetAll(self, name_id) -> List[TableStockModel]:
-        try:
-            connection = db_connection()
-            cursor = connection.cursor()
-
-            queue = """SELECT name FROM stock_names WHERE name_id = %s"""
-            cursor.execute(queue, (name_id,))
-            stock_name = cursor.fetchall()[0][0].lower()
+    # Интервалы прореживания: выражение группировки и шаг до начала следующей группы
+    INTERVALS = {
+        '1h': None,
+        '1d': ('DATE(ts)', 'INTERVAL 1 DAY')
+    }
 
-            queue = f"""SELECT 
-                        date,
+    @classmethod
+    def build_query(cls, name_id, begin_date=None, end_date=None, limit=None, page_cursor=None, interval='1h'):
+        if interval not in cls.INTERVALS:
+            raise ValueError(f'Неизвестный интервал {interval}, доступны: {", ".join(cls.INTERVALS)}')
+
+        conditions, params = ['ticker_id = %s'], [name_id]
+        if begin_date:
+            conditions.append('ts >= %s')
+            params.append(begin_date)
+        if end_date:
+            conditions.append('ts <= %s')
+            params.append(end_date)
+
+        # Keyset-пагинация: page_cursor - дата последней строки предыдущей страницы
+        bucket = cls.INTERVALS[interval]
+        if page_cursor:
+            if bucket:
+                conditions.append(f'ts >= DATE_ADD(%s, {bucket[1]})')
+            else:
+                conditions.append('ts > %s')
+            params.append(page_cursor)
+
+        where = ' AND '.join(conditions)
+        limit_queue = ''
+        if limit is not None:
+            limit_queue = 'LIMIT %s'
+            params.append(int(limit))
+
+        if not bucket:
+            queue = f"""SELECT
+                        ts,
                         open,
                         high,
                         low,
                         close,
                         volume
-                        FROM {stock_name}
-                        ORDER BY date"""
-            cursor.execute(queue)
+                        FROM candles
+                        WHERE {where}
+                        ORDER BY ts
+                        {limit_queue}"""
+            return queue, params
+
+        # OHLCV-агрегация: open первой свечи группы, close последней, экстремумы и сумма объема
+        queue = f"""SELECT
+                    b.bucket,
+                    o.open,
+                    b.high,
+                    b.low,
+                    c.close,
+                    b.volume
+                    FROM (SELECT
+                        {bucket[0]} as bucket,
+                        MIN(ts) as first_ts,
+                        MAX(ts) as last_ts,
+                        MAX(high) as high,
+                        MIN(low) as low,
+                        SUM(volume) as volume
+                        FROM candles
+                        WHERE {where}
+                        GROUP BY bucket
+                        ORDER BY bucket
+                        {limit_queue}) as b
+                    JOIN candles as o ON o.ticker_id = %s AND o.ts = b.first_ts
+                    JOIN candles as c ON c.ticker_id = %s AND c.ts = b.last_ts
+                    ORDER BY b.bucket"""
+        return queue, params + [name_id, name_id]
+
+    @classmethod
+    def GetAll(self, name_id, begin_date=None, end_date=None, limit=None, page_cursor=None,
+               interval='1h') -> List[TableStockModel]:
+        try:
+            queue, params = self.build_query(name_id, begin_date, end_date, limit, page_cursor, interval)
+
+            connection = db_connection()
+            cursor = connection.cursor()
+
+            cursor.execute(queue, params)
             data = cursor.fetchall()
 
             close_connection(connection)
@@ -76,14 +136,72 @@ class TableStockService:
             print(f'Ошибка в сервисе: {e}')
             return None
 
+    @classmethod
+    def Stream(cls, connection, name_ids, begin_date=None, end_date=None, interval='1h', chunk_size=1000):
+        # Соединение берет вызывающий, первый запрос выполняется сразу, до ответа клиенту: ошибка БД
+        # становится кодом ответа, а не обрезанной выгрузкой со статусом 200. Соединение закрывает генератор
+        try:
+            cursor = cls._execute_stream(connection, name_ids[0], begin_date, end_date, interval)
+        except Exception:
+            close_connection(connection)
+            raise
+
+        rows = cls._stream_rows(connection, cursor, name_ids, begin_date, end_date, interval, chunk_size)
+        # Доводим генератор до try: закрытие ответа вернет соединение в пул, даже если выгрузка не началась
+        next(rows)
+        return rows
+
+    @classmethod
+    def _execute_stream(cls, connection, name_id, begin_date, end_date, interval):
+        queue, params = cls.build_query(name_id, begin_date, end_date, interval=interval)
+
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(queue, params)
+        return cursor
+
+    @classmethod
+    def _stream_rows(cls, connection, cursor, name_ids, begin_date, end_date, interval, chunk_size):
+        # Построчная выгрузка через небуферизованный курсор: в памяти не больше chunk_size строк.
+        # Прерванная выгрузка закрывает соединение в finally - недочитанный курсор не держит его занятым
+        try:
+            yield
+
+            for i, name_id in enumerate(name_ids):
+                if i:
+                    cursor.close()
+                    cursor = cls._execute_stream(connection, name_id, begin_date, end_date, interval)
+
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        yield name_id, TableStockModel(
+                            date=str(row[0]),
+                            open=float(row[1]),
+                            high=float(row[2]),
+                            low=float(row[3]),
+                            close=float(row[4]),
+                            volume=int(row[5])
+                        )
+        finally:
+            close_connection(connection)
+
     @classmethod
     def Post(cls, delimiter, name, full_name, begin_date, end_date) -> bool:
-        return load_df(delimiter=delimiter, name=name, full_name=full_name,
-                       begin_date=begin_date, end_date=end_date)
+        check = load_df(delimiter=delimiter, name=name, full_name=full_name,
+                        begin_date=begin_date, end_date=end_date)
+        if check:
+            prediction_cache.invalidate(name.lower())
+        return check
 
     @classmethod
     def Update(cls, delimiter, name) -> bool:
-        return update_df(delimiter, name)
+        check = update_df(delimiter, name)
+        if check:
+            prediction_cache.invalidate(name.lower())
+        return check
 
     @classmethod
     def Delete(cls, name_id):
@@ -91,12 +209,8 @@ class TableStockService:
             connection = db_connection()
             cursor = connection.cursor()
 
-            queue = """SELECT name FROM stock_names WHERE name_id = %s"""
+            queue = """DELETE FROM candles WHERE ticker_id = %s"""
             cursor.execute(queue, (name_id,))
-            stock_name = cursor.fetchall()[0][0]
-
-            queue = f"""DELETE FROM {stock_name}"""
-            cursor.execute(queue)
             connection.commit()
 
             connection.close()
@@ -16,24 +16,37 @@ def serialize_date(obj):
 class UserService:
 
     @classmethod
-    def GetAll(self) -> List[UserInfoModel]:
+    def GetAll(self, begin_date=None, end_date=None, limit=None, offset=0) -> List[UserInfoModel]:
         try:
             connection = db_connection()
             cursor = connection.cursor()
 
-            queue = """SELECT * FROM user_info ORDER BY date"""
-            cursor.execute(queue)
+            conditions, params = [], []
+            if begin_date:
+                conditions.append('date >= %s')
+                params.append(begin_date)
+            if end_date:
+                conditions.append('date <= %s')
+                params.append(end_date)
+
+            queue = """SELECT id, date FROM user_info"""
+            if conditions:
+                queue += ' WHERE ' + ' AND '.join(conditions)
+            queue += ' ORDER BY date'
+            if limit is not None or offset:
+                # В MySQL OFFSET без LIMIT не бывает: без лимита берем максимальное значение
+                queue += ' LIMIT %s OFFSET %s'
+                params += [int(limit) if limit is not None else 18446744073709551615, int(offset)]
+
+            cursor.execute(queue, params)
             data = cursor.fetchall()
 
-            close_connection(connection)
-            result_list = []
-
-            for record in data:
+            securities = TableSecuritiesService.get_all_by_users(cursor, [record[0] for record in data])
 
-                list_table_securities = TableSecuritiesService.GetAll(record[0])
-                result_list.append(UserInfoModel(id=record[0], date=serialize_date(record[1]), table_securities=list_table_securities))
+            close_connection(connection)
 
-            return result_list
+            return [UserInfoModel(id=record[0], date=serialize_date(record[1]), table_securities=securities[record[0]])
+                    for record in data]
 
         except Exception as e:
             print(f'Ошибка в сервисе: {e}')
@@ -51,8 +64,8 @@ class UserService:
             mm = {}
 
             for i in names:
-                queue = f"SELECT close FROM {i.name} ORDER BY date DESC LIMIT 2;"
-                cursor.execute(queue)
+                queue = "SELECT close FROM candles WHERE ticker_id = %s ORDER BY ts DESC LIMIT 2;"
+                cursor.execute(queue, (i.id,))
                 closes = cursor.fetchall()
 
                 if not mx and not mm:
@@ -4,30 +4,60 @@ import time
 from app.services.user_info_service import UserService
 from app.services.stock_names_service import StockNamesService
 from app.services.table_stock_service import TableStockService
+from app.services.ml_predict_service import MlPredictService
+from app.config import Config
+from app.utils.migrate_candles import migrate_candles
+from app.utils.ingestion import run_parallel
+
+
+BACKFILL_TICKERS = [('sber', 'Сбербанк'), ('gazp', 'Газпром'), ('mgnt', 'Магнит')]
+
+BACKFILL_PERIODS = [('2025-12-01', '2025-12-14'), ('2025-11-01', '2025-12-01'), ('2025-10-01', '2025-11-01')]
+
+
+def backfill_task(name, full_name):
+    # Периоды одного тикера грузятся по очереди, чтобы не было гонки при добавлении в stock_names
+    def task():
+        return all([TableStockService.Post(';', name, full_name, begin_date, end_date)
+                    for begin_date, end_date in BACKFILL_PERIODS])
+
+    return task
+
+
+def update_all(names):
+    result = run_parallel({
+        i.name: (lambda name=i.name: TableStockService.Update(';', name)) for i in names
+    })
+
+    failed = [name for name, check in result.items() if not check]
+    if failed:
+        print('Не удалось обновить тикеры:', failed)
+
+    if Config.PRECOMPUTE_FORECASTS:
+        precompute_forecasts(names)
+
+
+def precompute_forecasts(names):
+    # Свечи обновлены - считаем прогнозы заранее, запрос к /ml_predict станет чтением из кэша
+    begin = time.monotonic()
+    count = MlPredictService.Precompute([i.name.lower() for i in names], Config.PRECOMPUTE_HORIZONS)
+    print(f'Предрасчитано прогнозов: {count} за {time.monotonic() - begin:.1f} с')
 
 
 def dynamic_update():
+    migrate_candles()
+
     names = StockNamesService.GetAllNames()
 
     if not names:
         print('Загружаем данные биржы в базу данных...')
-        # sber
-        TableStockService.Post(';', 'sber', 'Сбербанк', '2025-12-01', '2025-12-14')
-        TableStockService.Post(';', 'sber', 'Сбербанк', '2025-11-01', '2025-12-01')
-        TableStockService.Post(';', 'sber', 'Сбербанк', '2025-10-01', '2025-11-01')
-
-        # gazp
-        TableStockService.Post(';', 'gazp', 'Газпром', '2025-12-01', '2025-12-14')
-        TableStockService.Post(';', 'gazp', 'Газпром', '2025-11-01', '2025-12-01')
-        TableStockService.Post(';', 'gazp', 'Газпром', '2025-10-01', '2025-11-01')
+        run_parallel({
+            name: backfill_task(name, full_name) for name, full_name in BACKFILL_TICKERS
+        })
 
-        # mgnt
-        TableStockService.Post(';', 'mgnt', 'Магнит', '2025-12-01', '2025-12-14')
-        TableStockService.Post(';', 'mgnt', 'Магнит', '2025-11-01', '2025-12-01')
-        TableStockService.Post(';', 'mgnt', 'Магнит', '2025-10-01', '2025-11-01')
+        names = StockNamesService.GetAllNames() or []
 
-    for i in names:
-        TableStockService.Update(';', i.name)
+    update_all(names)
 
     users = UserService().GetAll()
     last_date = users[-1].date
@@ -53,8 +83,7 @@ def dynamic_update():
 
         print(f"Запуск задачи в {datetime.now()}")
 
-        for i in names:
-            TableStockService.Update(';', i.name)
+        update_all(names)
 
         now_date = datetime.now()
         last_date += timedelta(hours=1)
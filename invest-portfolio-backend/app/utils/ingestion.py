@@ -0,0 +1,65 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.config import Config
+
+
+class RateLimiter:
+    # Общий для всех потоков лимит: не чаще одного запроса в min_interval секунд
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+moex_limiter = RateLimiter(Config.MOEX_MIN_INTERVAL)
+
+
+def read_moex_csv(name, begin_date, end_date, delimiter):
+    url = f"""https://iss.moex.com/iss/engines/stock/markets/shares/securities/{name}/candles.csv?from={begin_date}&till={end_date}&interval=60"""
+
+    moex_limiter.wait()
+    return pd.read_csv(url,
+                       delimiter=delimiter,
+                       skiprows=2,  # Пропускаем первые 2 строки с заголовками
+                       header=0)  # Первая строка - заголовок колонок
+
+
+def with_retry(name, task, retries=Config.INGEST_RETRIES, backoff=Config.INGEST_BACKOFF):
+    # Задача считается неудачной, если вернула False или упала с исключением
+    for attempt in range(retries + 1):
+        try:
+            if task():
+                return True
+            print(f'Тикер {name}: загрузка не удалась (попытка {attempt + 1})')
+        except Exception as e:
+            print(f'Тикер {name}: ошибка загрузки (попытка {attempt + 1}): {e}')
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    return False
+
+
+def run_parallel(tasks, max_workers=Config.INGEST_WORKERS):
+    # tasks - словарь {тикер: функция без аргументов}. Тикеры загружаются параллельно,
+    # а все шаги одного тикера выполняются последовательно внутри его функции
+    if not tasks:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingestion') as executor:
+        futures = {name: executor.submit(with_retry, name, task) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -1,37 +1,29 @@
 import pandas as pd
+import numpy as np
 from datetime import date, timedelta
-from database.db_connection import db_connection
+from database.db_connection import pooled_connection
+from app.utils.ingestion import read_moex_csv
 
 
 def load_df(delimiter, name, full_name, begin_date, end_date):
 
-    url = f"""https://iss.moex.com/iss/engines/stock/markets/shares/securities/{name}/candles.csv?from={begin_date}&till={end_date}&interval=60"""
+    df = read_moex_csv(name, begin_date, end_date, delimiter)
 
-    df = pd.read_csv(url,
-                     delimiter=delimiter,
-                     skiprows=2,  # Пропускаем первые 2 строки с заголовками
-                     header=0)  # Первая строка - заголовок колонок
-
-    print(name, full_name, begin_date, end_date)
-    # ДЛЯ ОТЛАДКИ: посмотрим структуру данных
-    print("Структура данных:")
-    print(f"Колонки: {df.columns.tolist()}")
-    print(f"Первые 3 строки: {df.head(3)}")
-    print(f"Размер: {df.shape}")
-
-    connection = db_connection()
-    if connection:
-        check = create_table(connection, name)
-
-        if check:
-            check = create_records(connection, df, name)
+    # Соединение возвращается в пул на любом выходе, в том числе после ошибки
+    try:
+        with pooled_connection() as connection:
+            check = create_table(connection)
 
             if check:
                 check = add_stock_names(connection, name, full_name)
 
-        connection.close()
-        return check
-    else:
+                if check:
+                    check = create_records(connection, df, name)
+
+            return check
+
+    except Exception as e:
+        print(f'Ошибка загрузки свечей {name}: {e}')
         return False
 
 
@@ -55,15 +47,30 @@ def add_stock_names(connection, name, full_name):
         return False
 
 
-def create_table(connection, name):
-    table_queue = f"""CREATE TABLE IF NOT EXISTS {name} ( 
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    date DATETIME,
+def get_ticker_id(connection, name):
+    cursor = connection.cursor()
+
+    queue = """SELECT name_id FROM stock_names WHERE name = %s"""
+    cursor.execute(queue, (name,))
+    data = cursor.fetchall()
+
+    return data[0][0] if data else None
+
+
+def create_table(connection):
+    # Единое хранилище свечей всех тикеров. Составной первичный ключ (ticker_id, ts)
+    # дает индекс для выборок "последняя свеча до даты" и уникальность для upsert
+    table_queue = """CREATE TABLE IF NOT EXISTS candles (
+                    id BIGINT AUTO_INCREMENT,
+                    ticker_id INT NOT NULL,
+                    ts DATETIME NOT NULL,
                     open DECIMAL(10, 2),
                     high DECIMAL(10, 2),
                     low DECIMAL(10, 2),
                     close DECIMAL(10, 2),
-                    volume INT
+                    volume BIGINT,
+                    PRIMARY KEY (ticker_id, ts),
+                    UNIQUE KEY candles_id (id)
                     );"""
     try:
         cursor = connection.cursor()
@@ -99,11 +106,8 @@ def create_records(connection, df, name):
                     rename_dict[possible_name] = standard_col
                     break  # переходим к следующей колонке после нахождения совпадения
 
-        print(f"Словарь для переименования: {rename_dict}")  # ДЛЯ ОТЛАДКИ
-
         # Переименовываем колонки
         df = df.rename(columns=rename_dict)
-        print(f"Колонки после переименования: {list(df.columns)}")  # ДЛЯ ОТЛАДКИ
 
         # ПРОВЕРКА: есть ли нужные колонки после переименования
         required_columns = ['date', 'open', 'high', 'low', 'close', 'volume']
@@ -120,34 +124,18 @@ def create_records(connection, df, name):
         # Агрегация данных. Заполнение пустых значений
         df = agr_missing_values(df)
 
-        records = []
-        for _, row in df.iterrows():
-            record = (
-                row['date'] if pd.notna(row.get('date')) else None,
-                round(float(row.get('open', 0)), 2) if pd.notna(row.get('open')) else None,
-                round(float(row.get('high', 0)), 2) if pd.notna(row.get('high')) else None,
-                round(float(row.get('low', 0)), 2) if pd.notna(row.get('low')) else None,
-                round(float(row.get('close', 0)), 2) if pd.notna(row.get('close')) else None,
-                int(row.get('volume', 0)) if pd.notna(row.get('volume')) else None
-            )
-            records.append(record)
+        ticker_id = get_ticker_id(connection, name)
+        if ticker_id is None:
+            print(f'Тикер {name} не найден в таблице stock_names')
+            return False
+
+        records = build_records(df, ticker_id)
 
-        insert_query = f"""
-                INSERT INTO {name} 
-                (date, open, high, low, close, volume) 
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    open = VALUES(open),
-                    high = VALUES(high),
-                    low = VALUES(low),
-                    close = VALUES(close),
-                    volume = VALUES(volume)
-                """
         cursor = connection.cursor()
-        cursor.executemany(insert_query, records)
+        insert_records(cursor, records)
         connection.commit()
 
-        print(f'Данные успешно загружены в таблицу {name}')
+        print(f'Данные {name} успешно загружены в таблицу candles')
         return True
 
     except Exception as e:
@@ -155,41 +143,72 @@ def create_records(connection, df, name):
         return False
 
 
-def agr_missing_values(df):
-    columns = ['open', 'high', 'low', 'close']
+INSERT_CHUNK_SIZE = 5000
 
-    df_processed = df.copy()
+INSERT_COLUMNS = '(ticker_id, ts, open, high, low, close, volume)'
 
-    for column in columns:
 
-        missing_indices = df_processed[df_processed[column].isna()].index
+def build_records(df, ticker_id):
+    # Параметры вставки собираются сразу из столбцов, без обхода строк DataFrame
+    size = len(df)
+
+    def nullable(values, mask):
+        values = values.astype(object)
+        values[mask] = None
+        return values
+
+    # datetime64[us] -> object дает datetime из стандартной библиотеки, а NaT превращается в None
+    dates = pd.to_datetime(df['date']).to_numpy().astype('datetime64[us]').astype(object)
+    columns = [np.full(size, ticker_id, dtype=object), dates]
+
+    for column in ['open', 'high', 'low', 'close']:
+        values = df[column].to_numpy(dtype=float)
+        columns.append(nullable(np.round(values, 2), np.isnan(values)))
+
+    volume = df['volume'].to_numpy(dtype=float)
+    missing = np.isnan(volume)
+    columns.append(nullable(np.where(missing, 0, volume).astype(np.int64), missing))
+
+    return list(zip(*(column.tolist() for column in columns)))
+
+
+def insert_records(cursor, records, chunk_size=INSERT_CHUNK_SIZE):
+    # Многострочный INSERT пачками: один запрос на chunk_size свечей вместо построчной вставки
+    row_placeholder = '(' + ', '.join(['%s'] * 7) + ')'
+
+    for begin in range(0, len(records), chunk_size):
+        chunk = records[begin:begin + chunk_size]
+
+        insert_query = f"""
+                INSERT INTO candles
+                {INSERT_COLUMNS}
+                VALUES {', '.join([row_placeholder] * len(chunk))}
+                ON DUPLICATE KEY UPDATE
+                    open = VALUES(open),
+                    high = VALUES(high),
+                    low = VALUES(low),
+                    close = VALUES(close),
+                    volume = VALUES(volume)
+                """
+        cursor.execute(insert_query, [value for record in chunk for value in record])
+
 
-        for idx in missing_indices:
-            idx_up = 0
-            idx_down = 0
-            upper_value = None
-            lower_value = None
+def agr_missing_values(df):
+    # Линейная интерполяция пропусков между соседними значениями,
+    # на краях - ближайшее известное значение (как у np.interp)
+    columns = ['open', 'high', 'low', 'close']
 
-            # Поиск вниз (более поздние даты)
-            for low_idx in range(idx + 1, len(df_processed)):
-                if pd.notna(df_processed.loc[low_idx, column]):
-                    lower_value = df_processed.loc[low_idx, column]
-                    idx_down = low_idx
-                    break
+    df_processed = df.copy()
+    positions = np.arange(len(df_processed))
 
-            # Поиск вверх (более ранние даты)
-            for up_idx in range(idx - 1, -1, -1):
-                if pd.notna(df_processed.loc[up_idx, column]):
-                    upper_value = df_processed.loc[up_idx, column]
-                    idx_up = up_idx
-                    break
+    for column in columns:
+        values = df_processed[column].to_numpy(dtype=float, copy=True)
+        missing = np.isnan(values)
 
-            if upper_value is not None and lower_value is not None:
-                df_processed.loc[idx, column] = upper_value + ((lower_value - upper_value) / (idx_down - idx_up) * (idx - idx_up))
+        if not missing.any() or missing.all():
+            continue
 
-            elif upper_value is not None:
-                df_processed.loc[idx, column] = upper_value
+        values[missing] = np.interp(positions[missing], positions[~missing], values[~missing])
+        df_processed[column] = values
 
-            elif lower_value is not None:
-                df_processed.loc[idx, column] = lower_value
     return df_processed
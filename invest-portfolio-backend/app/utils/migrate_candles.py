@@ -0,0 +1,52 @@
+from database.db_connection import pooled_connection
+from app.utils.load_df import create_table
+
+
+def migrate_candles():
+    # Перенос свечей из старых таблиц вида {name} в единую таблицу candles.
+    # Перенесенная таблица переименовывается в {name}_legacy, поэтому повторный запуск ничего не делает
+    # Соединение возвращается в пул на любом выходе, в том числе после ошибки
+    try:
+        with pooled_connection() as connection:
+            if not create_table(connection):
+                return False
+
+            cursor = connection.cursor()
+
+            cursor.execute("""SELECT name_id, name FROM stock_names""")
+            names = cursor.fetchall()
+
+            for name_id, name in names:
+                queue = """SELECT COUNT(*) FROM information_schema.tables
+                           WHERE table_schema = DATABASE() AND table_name = %s"""
+                cursor.execute(queue, (name,))
+                if not cursor.fetchall()[0][0]:
+                    continue
+
+                queue = f"""INSERT INTO candles (ticker_id, ts, open, high, low, close, volume)
+                            SELECT %s, date, open, high, low, close, volume
+                            FROM {name}
+                            WHERE date IS NOT NULL
+                            ORDER BY date
+                            ON DUPLICATE KEY UPDATE
+                                open = VALUES(open),
+                                high = VALUES(high),
+                                low = VALUES(low),
+                                close = VALUES(close),
+                                volume = VALUES(volume)"""
+                cursor.execute(queue, (name_id,))
+
+                cursor.execute(f"""RENAME TABLE {name} TO {name}_legacy""")
+                connection.commit()
+
+                print(f'Свечи {name} перенесены в таблицу candles')
+
+            return True
+
+    except Exception as e:
+        print('Ошибка переноса свечей в таблицу candles:', e)
+        return False
+
+
+if __name__ == '__main__':
+    migrate_candles()
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import Config
+
+
+class PredictionCache:
+    # Готовые прогнозы по ключу (тикер, часы, время последней свечи, версия моделей).
+    # Новая свеча или переобученная модель дают новый ключ, поэтому старый прогноз не выдается;
+    # записи тикера дополнительно удаляются явно, когда загрузка свечей или обучение их устаревают.
+    # Сверх max_size вытесняется давно не использованная запись, старше ttl - не выдается
+
+    def __init__(self, max_size=Config.PREDICT_CACHE_SIZE, ttl=Config.PREDICT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # ключ -> (время записи, прогноз)
+        self._lock = threading.Lock()
+        self._compute_locks = {}
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get(self, key, compute):
+        # compute - функция без аргументов, считает прогноз при промахе
+        value = self._cached(key)
+        hit = value is not None
+
+        if not hit:
+            with self._lock:
+                compute_lock = self._compute_locks.setdefault(key, threading.Lock())
+
+            # Одинаковые запросы, пришедшие одновременно, считают прогноз один раз
+            with compute_lock:
+                value = self._cached(key)
+                hit = value is not None
+
+                if not hit:
+                    try:
+                        value = compute()
+                        self.put(key, value)
+                    finally:
+                        with self._lock:
+                            self._compute_locks.pop(key, None)
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return value
+
+    def lookup(self, key):
+        # Чтение без расчета при промахе - для пакетного прогноза, который считает промахи сам
+        value = self._cached(key)
+
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return value
+
+    def put(self, key, value):
+        if value is None:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+                return
+
+            for key in [key for key in self._entries if key[0] == ticker]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None
+            }
+
+
+prediction_cache = PredictionCache()
@@ -1,39 +1,72 @@
-
-
-def calc_market_signal(trend_prediction, stock_prediction):
-
-    # trend
-    trend_signal = 0
-    for pred in trend_prediction:
-        up, flat, down = pred
-        mx = max(pred)
-
-        if mx == up:
-            trend_signal += up
-        elif mx == down:
-            trend_signal -= down
-
-    # stock & volatility
-    stock_signal = 0
-    volatility_list = []
-    for i in range(1, len(stock_prediction)):
-        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
-        high, low = stock_prediction[i][2], stock_prediction[i][3]
-
-        change = (cur_close - pre_close) / cur_close * 10
-        stock_signal += change
-
-        volatility = (high - low) / pre_close * 10
-        volatility_list.append(volatility)
-    volatility_signal = 0
-    if len(volatility_list) > 0:
-        volatility_signal = max(0.3, 1 - sum(volatility_list) / len(volatility_list))
-
-    # result
-    score = 0.7 * trend_signal + 0.3 * stock_signal
-    score *= volatility_signal
-
-    return class_market_signal(score)
+import numpy as np
+
+
+def calc_scores(stock_prediction, trend_prediction) -> dict:
+    # Все оценки прогноза за один проход. stock_prediction - массив (..., часы, 4) с open, high, low, close,
+    # trend_prediction - (..., часы, 3) с вероятностями рост/флэт/падение. Ведущие оси - пакет прогнозов
+    # (тикеры или горизонты с одинаковым числом часов), оценки возвращаются массивами этой формы.
+    # Промежуточные оценки округляются до сотых, как в текстовых классах, и дальше идут уже округленными
+    stock_prediction = np.asarray(stock_prediction, dtype=np.float64)
+    trend_prediction = np.asarray(trend_prediction)
+
+    high, low, close = stock_prediction[..., 1], stock_prediction[..., 2], stock_prediction[..., 3]
+    hours = stock_prediction.shape[-2]
+    steps = max(hours - 1, 1)
+
+    # Общие для всех оценок величины: изменение close и размах свечи относительно прошлого close
+    delta = close[..., 1:] - close[..., :-1]
+    pre_close = close[..., :-1]
+    candle_range = (high[..., 1:] - low[..., 1:]) / pre_close
+    change = delta / close[..., 1:] * 10
+
+    # Класс тренд-модели на каждый час; при равенстве рост важнее падения
+    up, flat, down = trend_prediction[..., 0], trend_prediction[..., 1], trend_prediction[..., 2]
+    mx = trend_prediction.max(axis=-1)
+    is_up = up == mx
+    is_down = ~is_up & (down == mx)
+
+    # Рыночный сигнал
+    trend_signal = np.where(is_up, up, np.where(is_down, -down, 0)).sum(axis=-1)
+    stock_signal = change.sum(axis=-1)
+    volatility_signal = np.maximum(0.3, 1 - (candle_range * 10).sum(axis=-1) / steps) if hours > 1 else 0
+    market = np.round((0.7 * trend_signal + 0.3 * stock_signal) * volatility_signal, 2)
+
+    # Уверенность: средняя вероятность часов, где класс тренд-модели совпал с рыночным сигналом
+    market_ = market[..., np.newaxis]
+    agree = [is_up & (market_ > 0.1),
+             (down == mx) & (market_ < -0.1),
+             (flat == mx) & (market_ < 0.1) & (market_ > -0.1)]
+    assurance_values = np.select(agree, [up, down, flat], 0)
+    count = np.select(agree, [1, 1, 1], 0).sum(axis=-1)
+    assurance = np.round(assurance_values.sum(axis=-1) / np.maximum(count, 1), 2)
+
+    # Согласованность моделей: первый час засчитывается всегда
+    trend_class = np.where(is_up, 1, np.where(is_down, -1, 0))[..., 1:]
+    stock_class = np.select([change > 0.1, change < -0.1], [1, -1], 0)
+    balance = np.round((1 + (trend_class == stock_class).sum(axis=-1)) / hours, 2)
+
+    # Волатильность, %
+    volatility = np.round((candle_range * 100).sum(axis=-1) / steps, 2) if hours > 1 else np.ones(market.shape)
+
+    # Рекомендация
+    gain_signal = (delta / pre_close * 100).sum(axis=-1) / steps
+    # При нулевой волатильности риск не считается (раньше здесь было деление на ноль)
+    half_volatility = volatility[..., np.newaxis] * 0.5
+    risk_signal = np.divide(np.abs(delta), half_volatility, out=np.zeros(delta.shape),
+                            where=half_volatility != 0).sum(axis=-1) / steps
+    risk_signal = np.select([risk_signal > 2, risk_signal > 1, risk_signal < 0.5], [1, 0.5, -0.5], risk_signal)
+    volatility_score = np.select([volatility > 2.0, volatility > 1], [-1, -0.5], volatility)
+
+    recommendation = np.round(market * 3 + balance * 1.5 + gain_signal * 1.5 + risk_signal * 1.5 +
+                              volatility_score * 1, 2)
+
+    return {
+        'market': market,
+        'assurance': assurance,
+        'balance': balance,
+        'volatility': volatility,
+        'recommendation': recommendation
+    }
 
 
 def class_market_signal(score):
@@ -50,76 +83,6 @@ def class_market_signal(score):
         return f"Сильный медвежий! Высокая вероятность падения (score_signal = {score})", score
 
 
-def calc_assurance_trend(score, trend_prediction):
-
-    # trend
-    assurance_sum = 0
-    count = 0
-    for pred in trend_prediction:
-        up, flat, down = pred
-        mx = max(pred)
-
-        if mx == up and score > 0.1:
-            assurance_sum += up
-            count += 1
-        elif mx == down and score < -0.1:
-            assurance_sum += down
-            count += 1
-        elif mx == flat and (score < 0.1 and score > -0.1):
-            assurance_sum += flat
-            count += 1
-
-    if count == 0:
-        count += 1
-
-    return round(float(assurance_sum / count), 2)
-
-
-def calc_balance_models(trend_prediction, stock_prediction):
-    trend_signal = 0
-    for pred in trend_prediction:
-        up, flat, down = pred
-        mx = max(pred)
-
-        if mx == up:
-            trend_signal += up
-        elif mx == down:
-            trend_signal -= down
-
-    balance_score = 1
-
-    for i in range(1, len(stock_prediction)):
-
-        # trend
-        trend_signal = 0
-
-        up, flat, down = trend_prediction[i]
-        mx = max(trend_prediction[i])
-
-        if mx == up:
-            trend_signal = 1
-        elif mx == down:
-            trend_signal = -1
-
-        # stock
-        stock_signal = 0
-
-        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
-        change = (cur_close - pre_close) / cur_close * 10
-
-        if change > 0.1:
-            stock_signal = 1
-        elif change < -0.1:
-            stock_signal = -1
-
-        if stock_signal == trend_signal:
-            balance_score += 1
-
-    score = balance_score / len(stock_prediction)
-
-    return class_balance_models(score)
-
-
 def class_balance_models(score):
     score = round(float(score), 2)
     print(score)
@@ -137,26 +100,6 @@ def class_balance_models(score):
         return f"Осторожно! Две модели противоречивы! (score = {score})", score
 
 
-def calc_volatility(stock_prediction):
-
-    volatility_list = []
-
-    for i in range(1, len(stock_prediction)):
-        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
-        high, low = stock_prediction[i][2], stock_prediction[i][3]
-
-        volatility = (high - low) / pre_close * 100
-
-        volatility_list.append(volatility)
-
-    if len(volatility_list) > 0:
-        volatility = sum(volatility_list) / (len(stock_prediction) - 1)
-    else:
-        volatility = 1
-
-    return class_volatility(volatility)
-
-
 def class_volatility(volatility):
     volatility = round(float(volatility), 2)
     print(volatility)
@@ -169,49 +112,6 @@ def class_volatility(volatility):
         return f"Низкая волатильность (volatility = {volatility}%)", volatility
 
 
-def calc_recommendation_signal(stock_prediction, volatility, balance_score, market_score):
-    # Ожидаемая доходность и фактор риска
-    gain_factor = 0
-    risk_factor = 0
-
-    for i in range(1, len(stock_prediction)):
-        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
-        exp_gain = cur_close - pre_close
-
-        gain_factor += (exp_gain / pre_close) * 100
-        risk_factor += abs(exp_gain) / (volatility * 0.5)
-
-    if len(stock_prediction) > 1:
-        gain_signal = gain_factor / (len(stock_prediction) - 1)
-        risk_signal = risk_factor / (len(stock_prediction) - 1)
-    else:
-        gain_signal = 0
-        risk_signal = 0
-
-    if risk_signal > 2:
-        risk_signal = 1
-    elif risk_signal > 1:
-        risk_signal = 0.5
-    elif risk_signal < 0.5:
-        risk_signal = -0.5
-
-    volatility_signal = volatility
-    if volatility > 2.0:
-        volatility_signal = -1
-    elif volatility > 1:
-        volatility_signal = -0.5
-
-    total_score = (
-        market_score * 3 +
-        balance_score * 1.5 +
-        gain_signal * 1.5 +
-        risk_signal * 1.5 +
-        volatility_signal * 1
-    )
-
-    return class_recommendation_signal(total_score)
-
-
 def class_recommendation_signal(score):
     score = round(float(score), 2)
     print(score)
@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from app.config import Config
+from app.services.stock_names_service import StockNamesService
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m app.utils.train_all [тикер ...]
+# Без аргументов переобучаются все тикеры из stock_names
+
+
+def pin_threads(threads):
+    # Выполняется в каждом процессе до первой операции TensorFlow: процессы делят ядра поровну,
+    # а не запускают каждый по пулу потоков на все ядра машины
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def train_ticker(ticker):
+    # Модели импортируются уже внутри процесса, после pin_threads
+    from app.services.ml_train_service import MlTrainService
+
+    result = {'ticker': ticker, 'status': 'failed', 'wall_time': None, 'trend': None, 'stock': None}
+    begin = time.monotonic()
+
+    for stage, train in (('trend', MlTrainService.train_trend), ('stock', MlTrainService.train_stock)):
+        stage_begin = time.monotonic()
+        metrics = train(ticker)
+
+        if not metrics:
+            result['error'] = f'Обучение {stage} модели завершилось с ошибкой'
+            break
+
+        metrics['wall_time'] = round(time.monotonic() - stage_begin, 1)
+        result[stage] = metrics
+    else:
+        result['status'] = 'done'
+
+    result['wall_time'] = round(time.monotonic() - begin, 1)
+    return result
+
+
+def train_all(tickers=None, processes=Config.TRAIN_PROCESSES, threads=Config.TRAIN_THREADS_PER_PROCESS,
+              summary_path=Config.TRAIN_SUMMARY_PATH):
+    if not tickers:
+        tickers = [i.name for i in StockNamesService.GetAllNames() or []]
+
+    # Модели называются по тикеру в нижнем регистре - так их ищет прогноз
+    tickers = [ticker.lower() for ticker in tickers]
+
+    if not tickers:
+        print('Нет тикеров для обучения')
+        return None
+
+    cpu_count = os.cpu_count() or 1
+    processes = processes or min(len(tickers), cpu_count)
+    threads = threads or max(1, cpu_count // processes)
+
+    print(f'Обучение {len(tickers)} тикеров: {processes} процессов по {threads} потоков')
+
+    summary = {
+        'started_at': datetime.now().isoformat(),
+        'processes': processes,
+        'threads_per_process': threads,
+        'tickers': []
+    }
+    begin = time.monotonic()
+
+    # spawn: дочерний процесс не наследует состояние TensorFlow и соединения с БД родителя
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=pin_threads, initargs=(threads,)) as executor:
+        futures = {executor.submit(train_ticker, ticker): ticker for ticker in tickers}
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'ticker': futures[future], 'status': 'failed', 'error': str(e)}
+
+            print(f"Тикер {result['ticker']}: {result['status']}, {result.get('wall_time')} с")
+            summary['tickers'].append(result)
+
+    summary['tickers'].sort(key=lambda row: tickers.index(row['ticker']))
+    summary['finished_at'] = datetime.now().isoformat()
+    summary['wall_time'] = round(time.monotonic() - begin, 1)
+
+    os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2)
+
+    print(f"Обучение завершено за {summary['wall_time']} с, сводка: {summary_path}")
+    return summary
+
+
+if __name__ == '__main__':
+    train_all(sys.argv[1:])
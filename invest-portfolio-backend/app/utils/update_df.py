@@ -1,46 +1,37 @@
-import pandas as pd
 from datetime import date, timedelta
-from database.db_connection import db_connection
-from app.utils.load_df import create_records
+from database.db_connection import pooled_connection
+from app.utils.load_df import create_records, get_ticker_id
+from app.utils.ingestion import read_moex_csv
 
 
 def update_df(delimiter, name):
-    connection = db_connection()
-
-    if connection:
-
-        begin_date = get_end_date(connection, name)
-        end_date = date.today()
-
-        url = f"""https://iss.moex.com/iss/engines/stock/markets/shares/securities/{name}/candles.csv?from={begin_date}&till={end_date}&interval=60"""
-
-        df = pd.read_csv(url,
-                         delimiter=delimiter,
-                         skiprows=2,  # Пропускаем первые 2 строки с заголовками
-                         header=0)  # Первая строка - заголовок колонок
+    # Соединение возвращается в пул на любом выходе, в том числе после ошибки
+    try:
+        with pooled_connection() as connection:
+            begin_date = get_end_date(connection, name)
+            end_date = date.today()
 
-        # ДЛЯ ОТЛАДКИ: посмотрим структуру данных
-        print("Структура данных:")
-        print(f"Колонки: {df.columns.tolist()}")
-        print(f"Первые 3 строки: {df.head(3)}")
-        print(f"Размер: {df.shape}")
+            df = read_moex_csv(name, begin_date, end_date, delimiter)
 
-        check = del_cur_date(connection, name, begin_date)
+            check = del_cur_date(connection, name, begin_date)
 
-        if check:
-            check = create_records(connection, df, name)
+            if check:
+                check = create_records(connection, df, name)
 
-        return check
+            return check
 
-    else:
+    except Exception as e:
+        print(f'Ошибка обновления свечей {name}: {e}')
         return False
 
 
 def get_end_date(connection, name):
     cursor = connection.cursor()
 
-    queue = f"""SELECT CAST(`date` as DATE) FROM {name} ORDER BY `date` DESC LIMIT 1"""
-    cursor.execute(queue)
+    queue = """SELECT CAST(MAX(c.ts) as DATE) FROM candles as c
+               JOIN stock_names as st ON c.ticker_id = st.name_id
+               WHERE st.name = %s"""
+    cursor.execute(queue, (name,))
     date = cursor.fetchall()[0][0]
 
     return str(date)
@@ -50,8 +41,8 @@ def del_cur_date(connection, name, cur_date):
     try:
         cursor = connection.cursor()
 
-        query = f"DELETE FROM {name} WHERE date BETWEEN %s AND %s"
-        cursor.execute(query, (cur_date + ' 00:00:00', cur_date + ' 23:59:59'))
+        query = "DELETE FROM candles WHERE ticker_id = %s AND ts BETWEEN %s AND %s"
+        cursor.execute(query, (get_ticker_id(connection, name), cur_date + ' 00:00:00', cur_date + ' 23:59:59'))
 
         connection.commit()
         return True
@@ -59,4 +50,3 @@ def del_cur_date(connection, name, cur_date):
     except Exception as e:
         print('Ошибка удаления старых данных:', e)
         return False
-
@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.utils.load_df import agr_missing_values
+from benchmarks import candles
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_agr_missing_values
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def agr_missing_values_legacy(df):
+    # Прежняя реализация (поиск соседей построчно), эталон для сравнения
+    columns = ['open', 'high', 'low', 'close']
+
+    df_processed = df.copy()
+
+    for column in columns:
+
+        missing_indices = df_processed[df_processed[column].isna()].index
+
+        for idx in missing_indices:
+            idx_up = 0
+            idx_down = 0
+            upper_value = None
+            lower_value = None
+
+            for low_idx in range(idx + 1, len(df_processed)):
+                if pd.notna(df_processed.loc[low_idx, column]):
+                    lower_value = df_processed.loc[low_idx, column]
+                    idx_down = low_idx
+                    break
+
+            for up_idx in range(idx - 1, -1, -1):
+                if pd.notna(df_processed.loc[up_idx, column]):
+                    upper_value = df_processed.loc[up_idx, column]
+                    idx_up = up_idx
+                    break
+
+            if upper_value is not None and lower_value is not None:
+                df_processed.loc[idx, column] = upper_value + ((lower_value - upper_value) / (idx_down - idx_up) * (idx - idx_up))
+
+            elif upper_value is not None:
+                df_processed.loc[idx, column] = upper_value
+
+            elif lower_value is not None:
+                df_processed.loc[idx, column] = lower_value
+    return df_processed
+
+
+def make_candles(size, seed=0):
+    # Свечи MOEX с объемом, цены округлены до копеек. Пропуски идут сериями разной длины
+    # (пустые часы малоликвидных сессий), в том числе на краях
+    rng = np.random.default_rng(seed + 1)
+
+    df = candles.make_candles(size, seed).round(2)
+    df.insert(0, 'date', candles.moex_hours(size))
+    df['volume'] = rng.integers(1_000, 5_000_000, size)
+
+    for column in ['open', 'high', 'low', 'close']:
+        starts = rng.choice(size, size // 50, replace=False)
+        lengths = rng.geometric(0.5, len(starts))
+        for start, length in zip(starts, lengths):
+            df.loc[start:start + length - 1, column] = np.nan
+        df.loc[:2, column] = np.nan
+        df.loc[size - 3:, column] = np.nan
+
+    return df
+
+
+def bench(func, df):
+    begin = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - begin
+
+
+def main():
+    for size in SIZES:
+        df = make_candles(size)
+
+        new_result, new_time = bench(agr_missing_values, df)
+        old_result, old_time = bench(agr_missing_values_legacy, df)
+
+        columns = ['open', 'high', 'low', 'close']
+        equal = np.allclose(new_result[columns].to_numpy(float), old_result[columns].to_numpy(float),
+                            rtol=0, atol=1e-9, equal_nan=True)
+
+        print(f'{size:>9} строк | было {old_time:9.3f} с | стало {new_time:7.4f} с | '
+              f'ускорение x{old_time / new_time:,.0f} | результат совпадает: {equal}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import contextlib
+import io
+import time
+
+import keras
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from app.ml_models.src.data_processing.data_processing import DataProcessing
+from app.ml_models.src.data_processing.feature_pipeline import FeaturePipeline
+from app.ml_models.src.data_processing.indicator_engine import IndicatorEngine
+from app.ml_models.src.model.ml_model import MlModelStock
+from app.services.ml_predict_service import MlPredictService
+from benchmarks.candles import make_candles
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_feature_pipeline
+# Проверка совпадения прогноза со скейлерами обучения и время подготовки окна до и после
+
+STEPS = 200
+
+
+def make_scalers(seed=0):
+    # Скейлеры в том виде, в каком их сохраняло обучение до FeaturePipeline
+    rng = np.random.default_rng(seed)
+    feature = StandardScaler().fit(rng.normal(3, 2, (5000, 8)))
+    target = StandardScaler().fit(rng.normal(0, 0.01, (5000, 4)))
+    return {'feature': feature, 'target': target}
+
+
+def predict_stock_reference(model, scalers, window, trend_res):
+    # Прогноз сток-модели по скейлерам обучения (StandardScaler.transform), эталон для сравнения
+    x_data = DataProcessing().prepare_data(pd.DataFrame(window, columns=['open', 'high', 'low', 'close']))
+    x_data.loc[x_data.index[-1], 'trend'] = trend_res
+    x_data = scalers['feature'].transform(x_data.values)[np.newaxis]
+
+    predict = model(x_data.astype(np.float32))
+
+    list_predict = {}
+    temp_array = np.zeros((1, 4))
+    for j, key in enumerate(['open', 'high', 'low', 'close']):
+        temp_array[0, j] = np.asarray(predict[key])[0, 0]
+        unscaled = scalers['target'].inverse_transform(temp_array)
+        list_predict[key] = np.exp(unscaled[0, j]) * float(window[-1, j])
+        temp_array[0, j] = 0
+
+    return list_predict
+
+
+def main():
+    keras.utils.set_random_seed(0)
+    model = MlModelStock().create_model(8, 24)
+
+    window = make_candles(45).values
+    scalers = make_scalers()
+    pipelines = {key: FeaturePipeline.from_scaler(value) for key, value in scalers.items()}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = predict_stock_reference(model, scalers, window, 1)
+        engine = IndicatorEngine()
+        for candle in window:
+            engine.update(*candle)
+        result = MlPredictService._predict_stock(model, pipelines, engine.features(), window[-1], 1)
+
+    equal = all(reference[key] == result[key] for key in reference)
+    print(f'Прогноз совпадает с прогнозом по скейлерам обучения: {equal}')
+    # Скрипт служит регрессионной проверкой: потеря совпадения завершает его с ошибкой
+    assert equal, 'Прогноз расходится с прогнозом по скейлерам обучения'
+
+    # FeaturePipeline.fit против StandardScaler.fit на тех же данных
+    x = np.random.default_rng(1).normal(3, 2, (5000, 8))
+    x[:, 5] = 1.0
+    close = np.allclose(FeaturePipeline().fit(x).transform(x), StandardScaler().fit(x).transform(x), atol=1e-12)
+    print(f'FeaturePipeline.fit совпадает со StandardScaler: {close}')
+    assert close, 'FeaturePipeline.fit расходится со StandardScaler'
+
+    features = np.random.default_rng(2).normal(3, 2, (24, 8))
+
+    begin = time.perf_counter()
+    for _ in range(STEPS):
+        StandardScaler().fit_transform(features)
+    old_time = (time.perf_counter() - begin) / STEPS
+
+    begin = time.perf_counter()
+    for _ in range(STEPS):
+        pipelines['feature'].transform(features)
+    new_time = (time.perf_counter() - begin) / STEPS
+
+    print(f'Стандартизация окна: было fit_transform {old_time * 1e6:.0f} мкс | '
+          f'стало transform {new_time * 1e6:.1f} мкс | ускорение x{old_time / new_time:,.0f}')
+
+
+if __name__ == '__main__':
+    main()
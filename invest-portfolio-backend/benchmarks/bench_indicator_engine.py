@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import pandas as pd
+import talib
+
+from app.ml_models.src.data_processing.data_processing import DataProcessing
+from app.ml_models.src.data_processing.indicator_engine import IndicatorEngine
+from benchmarks.candles import make_candles
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_indicator_engine
+# Сверка IndicatorEngine с TA-Lib/pandas и время одного шага прогноза до и после
+
+SIZE = 5_000
+
+STEPS = 200
+
+WINDOW = 45
+
+
+def check_indicators(df):
+    # Каждый индикатор на каждой свече против TA-Lib и pandas на всей истории
+    log_close = np.log(df['close'] / df['close'].shift(1))
+    reference = {
+        'sma_20': talib.SMA(df['close'], timeperiod=20),
+        'atr': talib.ATR(df['high'], df['low'], df['close'], timeperiod=14),
+        'ma_10': talib.MA(log_close, 10),
+        'volatility_5': log_close.rolling(window=5).std(),
+        'volatility_20': log_close.rolling(window=20).std(),
+        'log_close': log_close
+    }
+
+    engine = IndicatorEngine()
+    result = {key: [] for key in reference}
+    for candle in df.values:
+        engine.update(*candle)
+        indicators = engine.indicators()
+        for key in reference:
+            result[key].append(indicators[key])
+
+    mismatched = []
+    for key, values in reference.items():
+        equal = np.allclose(np.asarray(values, dtype=float), result[key], rtol=1e-9, atol=1e-12, equal_nan=True)
+        print(f'{key:>14}: совпадает с TA-Lib/pandas {equal}')
+        if not equal:
+            mismatched.append(key)
+
+    # Скрипт служит регрессионной проверкой: расхождение завершает его с ошибкой
+    assert not mismatched, f'Индикаторы расходятся с TA-Lib/pandas: {mismatched}'
+
+
+def check_features(df):
+    # Окно признаков модели против DataProcessing.prepare_data на той же истории
+    reference = DataProcessing().prepare_data(df).values
+
+    engine = IndicatorEngine(length=len(df))
+    for candle in df.values:
+        engine.update(*candle)
+
+    features = engine.features()
+    equal = features.shape == reference.shape and np.allclose(features, reference, rtol=1e-9, atol=1e-12)
+    deviation = np.abs(features - reference).max() if features.shape == reference.shape else float('inf')
+    print(f'Признаки prepare_data: совпадают {equal}, макс. отклонение {deviation:.1e}')
+    assert equal, 'Окно признаков IndicatorEngine расходится с DataProcessing.prepare_data'
+
+
+def main():
+    # Свечи без изменения цены дают нулевые доходности - крайний случай для меток тренда
+    df = make_candles(SIZE, flat=slice(100, 120))
+
+    check_indicators(df)
+    check_features(df)
+
+    # Шаг прогноза: раньше prepare_data по окну из 45 свечей, теперь одна свеча в движок
+    window = df.values[:WINDOW].copy()
+    begin = time.perf_counter()
+    for candle in df.values[WINDOW:WINDOW + STEPS]:
+        window[:-1] = window[1:]
+        window[-1] = candle
+        DataProcessing().prepare_data(pd.DataFrame(window, columns=['open', 'high', 'low', 'close']))
+    old_time = (time.perf_counter() - begin) / STEPS
+
+    engine = IndicatorEngine()
+    for candle in df.values[:WINDOW]:
+        engine.update(*candle)
+    begin = time.perf_counter()
+    for candle in df.values[WINDOW:WINDOW + STEPS]:
+        engine.update(*candle)
+        engine.features()
+    new_time = (time.perf_counter() - begin) / STEPS
+
+    print(f'Признаки на шаг прогноза: было {old_time * 1e3:.2f} мс | стало {new_time * 1e3:.3f} мс | '
+          f'ускорение x{old_time / new_time:,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+import keras
+import numpy as np
+
+from app.ml_models.src.model.export_model import (QUANTIZATIONS, TFLiteModel, calibration_sample, export_tflite,
+                                                  quantization_report, tflite_path)
+from app.ml_models.src.model.ml_model import MlModelStock, MlModelTrend
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_quantization
+# Экспорт квантованных копий и отчет: размер, время вызова и потери относительно float32.
+# Целевые значения - выходы float32 .tflite, поэтому потери в отчете - чистая ошибка квантования
+
+TRAIN_WINDOWS = 1000
+
+TEST_WINDOWS = 300
+
+
+def reference(path, x_test):
+    model = TFLiteModel(tflite_path(path))
+    outputs = [model(x.reshape(model.input_shape)) for x in x_test]
+
+    if isinstance(outputs[0], dict):
+        return {key: np.array([np.asarray(out[key]).ravel()[0] for out in outputs]) for key in outputs[0]}
+    return np.eye(3)[[np.asarray(out).argmax() for out in outputs]]
+
+
+def main():
+    keras.utils.set_random_seed(0)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, model in (('trend', MlModelTrend().create_model(14, 100)), ('stock', MlModelStock().create_model(8, 24))):
+            path = os.path.join(directory, f'{name}.keras')
+            model.save(path)
+
+            x_train = rng.normal(size=(TRAIN_WINDOWS,) + tuple(model.input_shape[1:])).astype(np.float32)
+            x_test = rng.normal(size=(TEST_WINDOWS,) + tuple(model.input_shape[1:])).astype(np.float32)
+
+            export_tflite(model, path, QUANTIZATIONS, calibration_sample(x_train))
+            report = quantization_report(path, x_test, reference(path, x_test), QUANTIZATIONS)
+
+            for variant, row in report['variants'].items():
+                if 'mae' in row:
+                    loss = f"MAE {max(row['mae'].values()):.2e}"
+                else:
+                    loss = f"точность {row['accuracy']:.3f}"
+
+                print(f"{name} {variant:8}: {row['size'] / 1024:7.0f} КБ, вызов {row['latency_ms']:.2f} мс, {loss}" +
+                      (f", меньше x{row['size_ratio']}, быстрее x{row['speedup']}" if 'size_ratio' in row else ''))
+
+            missing = [i for i in QUANTIZATIONS if i not in report['variants']]
+            if missing:
+                print(f"{name}: не экспортированы {', '.join(missing)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_startup
+# Холодный create_app() в отдельном процессе. "Было" воспроизводится импортом ML-стека перед create_app -
+# его раньше тянули за собой predict_route и ml_train_route. Отдельно - цена первого прогноза и обучения
+
+RUNS = 3
+
+HEAVY = ('tensorflow', 'keras', 'talib', 'sklearn')
+
+STARTUP = """
+import sys, time
+begin = time.perf_counter()
+{preload}
+from app import create_app
+create_app()
+print(time.perf_counter() - begin, ','.join(m for m in {heavy!r} if m in sys.modules) or '-')
+"""
+
+# Импорты, которые выполняются при первом вызове: прогноз по .tflite, прогноз по Keras, обучение
+FIRST_USE = {
+    'прогноз tflite': 'from app.ml_models.src.model.export_model import _interpreter_class; _interpreter_class()',
+    'прогноз keras': 'from app.ml_models.src.model import train_model_stock, train_model_trend',
+    'обучение': 'from app.ml_models.src.model import train_progress, ml_model, train_model_stock, train_model_trend',
+}
+
+FIRST_USE_CODE = """
+import sys, time
+from app import create_app
+create_app()
+begin = time.perf_counter()
+{code}
+print(time.perf_counter() - begin, ','.join(m for m in {heavy!r} if m in sys.modules) or '-')
+"""
+
+
+def run(code):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    times, modules = [], None
+    for _ in range(RUNS):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                env=env, cwd=os.getcwd()).stdout.split()
+        times.append(float(output[-2]))
+        modules = output[-1]
+    return statistics.median(times), modules
+
+
+def main():
+    before, before_modules = run(STARTUP.format(preload='import tensorflow, keras, talib, sklearn', heavy=HEAVY))
+    after, after_modules = run(STARTUP.format(preload='', heavy=HEAVY))
+
+    print(f'Холодный create_app(): было {before:.2f} с ({before_modules}) | '
+          f'стало {after:.2f} с ({after_modules}) | быстрее x{before / after:.1f}')
+
+    for name, code in FIRST_USE.items():
+        elapsed, modules = run(FIRST_USE_CODE.format(code=code, heavy=HEAVY))
+        print(f'Первый вызов, {name}: +{elapsed:.2f} с на импорт ({modules})')
+
+
+if __name__ == '__main__':
+    main()
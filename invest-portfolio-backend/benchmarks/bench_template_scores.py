@@ -0,0 +1,243 @@
+import contextlib
+import io
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.utils.prepare_template_predict import (calc_scores, class_market_signal, class_balance_models,
+                                                class_volatility, class_recommendation_signal)
+from benchmarks.candles import make_forecast_candles
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_template_scores
+# Сверка оценок прогноза с прежними построчными функциями и время на весь список тикеров
+
+TICKERS = 50
+
+HOURS = [1, 2, 6, 24, 168]
+
+
+# Прежние реализации (цикл по строкам прогноза в каждой функции), эталон для сравнения
+
+
+def calc_market_signal_legacy(trend_prediction, stock_prediction):
+
+    # trend
+    trend_signal = 0
+    for pred in trend_prediction:
+        up, flat, down = pred
+        mx = max(pred)
+
+        if mx == up:
+            trend_signal += up
+        elif mx == down:
+            trend_signal -= down
+
+    # stock & volatility
+    stock_signal = 0
+    volatility_list = []
+    for i in range(1, len(stock_prediction)):
+        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
+        high, low = stock_prediction[i][2], stock_prediction[i][3]
+
+        change = (cur_close - pre_close) / cur_close * 10
+        stock_signal += change
+
+        volatility = (high - low) / pre_close * 10
+        volatility_list.append(volatility)
+    volatility_signal = 0
+    if len(volatility_list) > 0:
+        volatility_signal = max(0.3, 1 - sum(volatility_list) / len(volatility_list))
+
+    # result
+    score = 0.7 * trend_signal + 0.3 * stock_signal
+    score *= volatility_signal
+
+    return class_market_signal(score)
+
+
+def calc_assurance_trend_legacy(score, trend_prediction):
+
+    # trend
+    assurance_sum = 0
+    count = 0
+    for pred in trend_prediction:
+        up, flat, down = pred
+        mx = max(pred)
+
+        if mx == up and score > 0.1:
+            assurance_sum += up
+            count += 1
+        elif mx == down and score < -0.1:
+            assurance_sum += down
+            count += 1
+        elif mx == flat and (score < 0.1 and score > -0.1):
+            assurance_sum += flat
+            count += 1
+
+    if count == 0:
+        count += 1
+
+    return round(float(assurance_sum / count), 2)
+
+
+def calc_balance_models_legacy(trend_prediction, stock_prediction):
+    trend_signal = 0
+    for pred in trend_prediction:
+        up, flat, down = pred
+        mx = max(pred)
+
+        if mx == up:
+            trend_signal += up
+        elif mx == down:
+            trend_signal -= down
+
+    balance_score = 1
+
+    for i in range(1, len(stock_prediction)):
+
+        # trend
+        trend_signal = 0
+
+        up, flat, down = trend_prediction[i]
+        mx = max(trend_prediction[i])
+
+        if mx == up:
+            trend_signal = 1
+        elif mx == down:
+            trend_signal = -1
+
+        # stock
+        stock_signal = 0
+
+        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
+        change = (cur_close - pre_close) / cur_close * 10
+
+        if change > 0.1:
+            stock_signal = 1
+        elif change < -0.1:
+            stock_signal = -1
+
+        if stock_signal == trend_signal:
+            balance_score += 1
+
+    score = balance_score / len(stock_prediction)
+
+    return class_balance_models(score)
+
+
+def calc_volatility_legacy(stock_prediction):
+
+    volatility_list = []
+
+    for i in range(1, len(stock_prediction)):
+        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
+        high, low = stock_prediction[i][2], stock_prediction[i][3]
+
+        volatility = (high - low) / pre_close * 100
+
+        volatility_list.append(volatility)
+
+    if len(volatility_list) > 0:
+        volatility = sum(volatility_list) / (len(stock_prediction) - 1)
+    else:
+        volatility = 1
+
+    return class_volatility(volatility)
+
+
+def calc_recommendation_signal_legacy(stock_prediction, volatility, balance_score, market_score):
+    # Ожидаемая доходность и фактор риска
+    gain_factor = 0
+    risk_factor = 0
+
+    for i in range(1, len(stock_prediction)):
+        cur_close, pre_close = stock_prediction[i][4], stock_prediction[i - 1][4]
+        exp_gain = cur_close - pre_close
+
+        gain_factor += (exp_gain / pre_close) * 100
+        risk_factor += abs(exp_gain) / (volatility * 0.5)
+
+    if len(stock_prediction) > 1:
+        gain_signal = gain_factor / (len(stock_prediction) - 1)
+        risk_signal = risk_factor / (len(stock_prediction) - 1)
+    else:
+        gain_signal = 0
+        risk_signal = 0
+
+    if risk_signal > 2:
+        risk_signal = 1
+    elif risk_signal > 1:
+        risk_signal = 0.5
+    elif risk_signal < 0.5:
+        risk_signal = -0.5
+
+    volatility_signal = volatility
+    if volatility > 2.0:
+        volatility_signal = -1
+    elif volatility > 1:
+        volatility_signal = -0.5
+
+    total_score = (
+        market_score * 3 +
+        balance_score * 1.5 +
+        gain_signal * 1.5 +
+        risk_signal * 1.5 +
+        volatility_signal * 1
+    )
+
+    return class_recommendation_signal(total_score)
+
+
+def template_legacy(table_predict, trend_predict):
+    market_signal, score_market_signal = calc_market_signal_legacy(trend_predict, table_predict)
+    assurance = calc_assurance_trend_legacy(score_market_signal, trend_predict)
+    balance_signal, score_balance_signal = calc_balance_models_legacy(trend_predict, table_predict)
+    volatility_signal, volatility = calc_volatility_legacy(table_predict)
+    recommendation_signal = calc_recommendation_signal_legacy(table_predict, volatility,
+                                                              score_balance_signal, score_market_signal)
+    return market_signal, assurance, balance_signal, volatility_signal, recommendation_signal
+
+
+def template_batch(stock, trend):
+    scores = calc_scores(stock, trend)
+    return [(class_market_signal(scores['market'][i])[0], float(scores['assurance'][i]),
+             class_balance_models(scores['balance'][i])[0], class_volatility(scores['volatility'][i])[0],
+             class_recommendation_signal(scores['recommendation'][i]))
+            for i in range(len(stock))]
+
+
+def make_forecasts(tickers, hours, seed=0):
+    # Прогнозы в том виде, в каком их отдает MlPredictService.predict
+    rng = np.random.default_rng(seed + 1)
+    stock = make_forecast_candles((tickers, hours), seed)
+
+    trend = rng.dirichlet([1, 1, 1], (tickers, hours)).astype(np.float32)
+
+    date = datetime(2025, 12, 1)
+    tables = [[[date + timedelta(hours=h), *stock[t, h]] for h in range(hours)] for t in range(tickers)]
+
+    return stock, trend, tables
+
+
+def main():
+    for hours in HOURS:
+        stock, trend, tables = make_forecasts(TICKERS, hours)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            begin = time.perf_counter()
+            old_result = [template_legacy(tables[t], list(trend[t])) for t in range(TICKERS)]
+            old_time = time.perf_counter() - begin
+
+            begin = time.perf_counter()
+            new_result = template_batch(stock, trend)
+            new_time = time.perf_counter() - begin
+
+        matched = sum(old == new for old, new in zip(old_result, new_result))
+        print(f'{hours:>4} ч x {TICKERS} тикеров | было {old_time * 1e3:7.2f} мс | стало {new_time * 1e3:6.2f} мс | '
+              f'совпадает {matched}/{TICKERS}')
+
+
+if __name__ == '__main__':
+    main()
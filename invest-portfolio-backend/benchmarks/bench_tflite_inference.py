@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import keras
+import numpy as np
+
+from app.ml_models.src.model.export_model import TFLiteModel, export_tflite, tflite_path
+from app.ml_models.src.model.ml_model import MlModelStock, MlModelTrend
+from app.services.ml_predict_service import MlPredictService
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_tflite_inference
+# Сверка выходов .tflite с моделью Keras, время одного вызова и холодная загрузка в отдельном процессе
+
+SAMPLES = 200
+
+CALLS = 300
+
+# Холодный старт: импорт рантайма и загрузка модели, пиковая память процесса (VmHWM, только Linux)
+LOAD_KERAS = """
+import time
+begin = time.perf_counter()
+import keras
+model = keras.models.load_model({path!r})
+rss = [line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(time.perf_counter() - begin, int(rss) / 1024)
+"""
+
+LOAD_TFLITE = """
+import time
+begin = time.perf_counter()
+from app.ml_models.src.model.export_model import TFLiteModel
+model = TFLiteModel({path!r})
+rss = [line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(time.perf_counter() - begin, int(rss) / 1024)
+"""
+
+
+def cold_load(code, path):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    output = subprocess.run([sys.executable, '-c', code.format(path=path)], capture_output=True, text=True,
+                            env=env, cwd=os.getcwd()).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+
+def compare(name, model, path):
+    serve = MlPredictService._serving_function(model)
+    lite = TFLiteModel(tflite_path(path))
+
+    rng = np.random.default_rng(0)
+    inputs = rng.normal(size=(SAMPLES, 1) + tuple(model.input_shape[1:])).astype(np.float32)
+
+    diff = 0.0
+    same_class = 0
+    for x in inputs:
+        reference, result = serve(x), lite(x)
+        if isinstance(reference, dict):
+            diff = max(diff, max(float(np.abs(np.asarray(reference[key]) - result[key]).max()) for key in reference))
+        else:
+            reference = np.asarray(reference)
+            diff = max(diff, float(np.abs(reference - result).max()))
+            same_class += int(reference.argmax() == result.argmax())
+
+    timings = []
+    for runner in (serve, lite):
+        runner(inputs[0])
+        begin = time.perf_counter()
+        for x in inputs[np.arange(CALLS) % SAMPLES]:
+            runner(x)
+        timings.append((time.perf_counter() - begin) / CALLS)
+
+    (keras_load, keras_rss), (lite_load, lite_rss) = cold_load(LOAD_KERAS, path), cold_load(LOAD_TFLITE, tflite_path(path))
+
+    print(f'{name}: макс. отклонение {diff:.1e}' +
+          (f', класс совпадает {same_class}/{SAMPLES}' if same_class else '') +
+          f' | вызов: keras {timings[0] * 1e3:.2f} мс, tflite {timings[1] * 1e3:.2f} мс' +
+          f' | холодная загрузка: keras {keras_load:.1f} с / {keras_rss:.0f} МБ, '
+          f'tflite {lite_load:.2f} с / {lite_rss:.0f} МБ')
+
+
+def main():
+    keras.utils.set_random_seed(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, model in (('trend', MlModelTrend().create_model(14, 100)), ('stock', MlModelStock().create_model(8, 24))):
+            path = os.path.join(directory, f'{name}.keras')
+            model.save(path)
+            export_tflite(model, path)
+
+            compare(name, model, path)
+
+
+if __name__ == '__main__':
+    main()
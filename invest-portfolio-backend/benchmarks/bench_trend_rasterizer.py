@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.ml_models.src.data_processing.data_processing_trend import DataProcessingTrend
+from benchmarks import candles
+
+
+# Запуск из директории 'invest-portfolio-backend': python -m benchmarks.bench_trend_rasterizer
+
+SIZES = [1_000, 10_000]
+
+LENGTH, WIDTH = 14, 100
+
+
+def prepare_data_legacy(df, length, width):
+    # Прежний путь: create_matrice для каждого окна по отдельности
+    close = df['close'].tolist()
+    open = df['open'].tolist()
+
+    list_matrice = []
+    for i in range(len(close) - length + 1):
+        matrice = DataProcessingTrend().create_matrice(open[i:i + length], close[i:i + length], length, width)
+        list_matrice.append(matrice)
+
+    return np.array(list_matrice)
+
+
+def make_candles(size, seed=0):
+    rng = np.random.default_rng(seed + 1)
+
+    close = candles.make_candles(size, seed)['close'].to_numpy().round(2)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    # Свечи без изменения цены и окна с одинаковыми ценами - крайние случаи сетки уровней
+    open_[rng.choice(size, size // 20, replace=False)] = close[rng.choice(size, size // 20, replace=False)]
+    close[100:120] = open_[100:120] = 250.0
+
+    return pd.DataFrame({'open': open_, 'close': close})
+
+
+def main():
+    for size in SIZES:
+        df = make_candles(size)
+
+        begin = time.perf_counter()
+        old_result = prepare_data_legacy(df, LENGTH, WIDTH)
+        old_time = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        new_result = DataProcessingTrend().prepare_data(df, LENGTH, WIDTH)
+        new_time = time.perf_counter() - begin
+
+        packed = DataProcessingTrend().prepare_data(df, LENGTH, WIDTH, packed=True)
+        unpacked = DataProcessingTrend.unpack_data(packed, LENGTH)
+
+        equal = old_result.shape == new_result.shape and np.array_equal(old_result, new_result)
+        print(f'{size:>7} свечей | было {old_time:8.3f} с | стало {new_time:7.4f} с | '
+              f'ускорение x{old_time / new_time:,.0f} | совпадает побитово: {equal} | '
+              f'память: {old_result.nbytes / 2 ** 20:.1f} МБ -> uint8 {new_result.nbytes / 2 ** 20:.1f} МБ, '
+              f'упаковано {packed.nbytes / 2 ** 20:.2f} МБ (распаковка совпадает: {np.array_equal(unpacked, new_result)})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+
+# Синтетические свечи для бенчмарков: цена - случайное блуждание от 250 с часовой волатильностью 0.4%
+
+
+def random_walk(rng, shape, start=250.0, sigma=0.004):
+    # Цены закрытия, время - по последней оси
+    return start * np.exp(np.cumsum(rng.normal(0, sigma, shape), axis=-1))
+
+
+def high_low(rng, open_, close, spread=0.003):
+    # Экстремумы свечи - немного за пределами open и close
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, spread, np.shape(close)))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, spread, np.shape(close)))
+    return high, low
+
+
+def make_candles(size, seed=0, flat=None):
+    # Часовые свечи, open - close предыдущей свечи. flat - срез свечей с одной ценой 250:
+    # нулевые доходности и одинаковые цены в окне - крайний случай для индикаторов и разметки тренда
+    rng = np.random.default_rng(seed)
+
+    close = random_walk(rng, size)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high, low = high_low(rng, open_, close)
+
+    df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close})
+    if flat is not None:
+        df.iloc[flat] = 250.0
+
+    return df
+
+
+def make_forecast_candles(shape, seed=0):
+    # Прогнозные свечи формы (*shape, 4) в порядке open, high, low, close: open не привязан к прошлому close
+    rng = np.random.default_rng(seed)
+
+    close = random_walk(rng, shape)
+    open_ = close * (1 + rng.normal(0, 0.002, shape))
+    high, low = high_low(rng, open_, close, spread=0.01)
+
+    return np.stack([open_, high, low, close], axis=-1)
+
+
+def moex_hours(size):
+    # Торговые часы MOEX: 10:00-23:00 по будням
+    hours = pd.date_range('1970-01-01', periods=int(size * 2.5), freq='h')
+    return hours[(hours.dayofweek < 5) & (hours.hour >= 10) & (hours.hour <= 23)][:size]
@@ -1,19 +1,191 @@
 from mysql import connector
+from contextlib import contextmanager
+from collections import deque
 
+import atexit
 import json
+import os
+import threading
+import time
+
+
+CONNECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'connection.json')
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PooledConnection:
+    # Обертка над соединением из пула: close() возвращает соединение в пул, а не рвет его
+    _connection = None
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, item):
+        return getattr(self._connection, item)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        # Соединение, которое забыли закрыть (например, после исключения), не должно теряться для пула
+        self.close()
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.release(connection)
+
+
+class ConnectionPool:
+
+    def __init__(self, settings, pool_size=10, idle_timeout=300, acquire_timeout=30):
+        self.settings = settings
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()  # (соединение, время возврата в пул)
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def _connect(self):
+        return connector.connect(
+            database=self.settings['database'],
+            user=self.settings['user'],
+            password=self.settings['password'],
+            host=self.settings['host']
+        )
+
+    def _evict_idle(self):
+        # Слева лежат самые давно вернувшиеся соединения
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            _close_quietly(connection)
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.acquire_timeout
+        connection = None
+
+        with self._condition:
+            while True:
+                self._evict_idle()
+
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                    break
+
+                if self._size < self.pool_size:
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(f'Все {self.pool_size} соединений пула заняты')
+                self._condition.wait(remaining)
+
+        # Проверка живости соединения (ping), мертвое заменяем новым
+        if connection is not None and not _is_alive(connection):
+            _close_quietly(connection)
+            connection = None
+
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        try:
+            # Закрываем открытую транзакцию, чтобы следующий владелец не видел старый снимок данных
+            connection.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+
+        with self._condition:
+            if reusable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                _close_quietly(connection)
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._size -= 1
+                _close_quietly(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+def _is_alive(connection):
+    try:
+        return connection.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                with open(CONNECTION_PATH, 'r', encoding='utf-8') as file:
+                    data_connection = json.load(file)
+
+                _pool = ConnectionPool(
+                    data_connection,
+                    pool_size=int(data_connection.get('pool_size', 10)),
+                    idle_timeout=float(data_connection.get('pool_idle_timeout', 300)),
+                    acquire_timeout=float(data_connection.get('pool_acquire_timeout', 30))
+                )
+                # При остановке процесса свободные соединения закрываются, а не обрываются сервером по таймауту
+                atexit.register(_pool.close_all)
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    with get_pool().connection() as connection:
+        yield connection
 
 
 def db_connection():
     try:
-        with open('database\connection.json', 'r', encoding='utf-8') as file:
-            data_connection = json.load(file)
-
-        connection = connector.connect(
-            database=data_connection['database'],
-            user=data_connection['user'],
-            password=data_connection['password'],
-            host=data_connection['host']
-        )
+        connection = get_pool().acquire()
 
         # # Данил Иванов
         # connection = connector.connect(